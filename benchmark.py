@@ -0,0 +1,260 @@
+from time import perf_counter
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+
+# Scaling benchmarks for the simulator and the analysis scripts. Every case runs
+# in its own subprocess so its peak RSS is its own, and reports wall time and
+# events/sec. Each case is run several times and its median kept. Results are
+# written as JSON and compared against a stored baseline, flagging any case that
+# got slower, bigger or lower-throughput by more than the threshold and by more
+# than an absolute noise floor.
+
+STRATEGY_NAMES = ["GreedyGossipStrategy", "RandomGossipStrategy", "HalfGreedyGossipStrategy",
+                  "HamiltonionStrategy", "PermutationStrategy"]
+NODE_COUNTS = [300, 1000, 10000, 100000]
+PROVIDERS = ["AWS", "Azure", "Google"]
+
+
+def get_strategy(name):
+    import gossip
+    import hamiltonian
+    import permuted
+    for module in [gossip, hamiltonian, permuted]:
+        if hasattr(module, name):
+            return getattr(module, name)
+    raise ValueError(f"Unknown strategy {name}")
+
+
+def build_network(strategy, node_count, degree):
+    from network import Network
+    from latency import LatencyModel
+    from latency_data import latency_data
+    from node import Node
+
+    lat = LatencyModel(latency_data, provider_list=PROVIDERS)
+    random.seed(0)
+    locations = random.choices(lat.locations, k=node_count)
+    strategy = get_strategy(strategy)
+
+    start_time = perf_counter()
+    nodes = [Node(locations[i], i, strategy(degree)) for i in range(node_count)]
+    network = Network(nodes, lat, seed=0)
+    network.initialize()
+    return network, perf_counter() - start_time
+
+
+# Each case returns (wall time, events processed)
+
+def bench_initialize(strategy, node_count, degree=10):
+    _, setup_time = build_network(strategy, node_count, degree)
+    return setup_time, node_count
+
+
+def bench_simulation(strategy, node_count, degree=10):
+    from netsim import run_simulation
+
+    network, _ = build_network(strategy, node_count, degree)
+    start_time = perf_counter()
+    run_simulation(network, 0, event_driven=True, verbose=False)
+    elapsed = perf_counter() - start_time
+
+    # Every packet is sent, and delivered unless it was lost
+    return elapsed, 2 * network.total_packets - network.lost_packets
+
+
+def bench_latency_lookup(api, count):
+    from latency import LatencyModel
+    from latency_data import latency_data
+
+    lat = LatencyModel(latency_data, provider_list=PROVIDERS)
+    rng = random.Random(0)
+    if api == "name":
+        pairs = [(rng.choice(lat.locations), rng.choice(lat.locations)) for _ in range(count)]
+        lookup = lat.get_latency
+    else:
+        pairs = [(rng.randrange(len(lat.locations)), rng.randrange(len(lat.locations))) for _ in range(count)]
+        lookup = lat.get_latency_by_id
+
+    start_time = perf_counter()
+    for a, b in pairs:
+        lookup(a, b)
+    return perf_counter() - start_time, count
+
+
+def bench_reachability(graph_type, n, chunk_size=640):
+    import graphsim
+
+    start_time = perf_counter()
+    result = graphsim.run_chunk((graph_type, n, 1, 0, 0, chunk_size, 10000))
+    return perf_counter() - start_time, result[graphsim.CHUNK_COLUMNS.index("total_count")]
+
+
+def bench_permute(implementation, count):
+    import numpy as np
+    from permute import create_params, permute, inverse, permute_array, inverse_array
+
+    n = count
+    params = create_params(n, 0x0123456789ABCDEF0123456789ABCDEF)
+    start_time = perf_counter()
+    if implementation == "scalar":
+        for i in range(n):
+            inverse(permute(i, params), params)
+    else:
+        inverse_array(permute_array(np.arange(n), params), params)
+    return perf_counter() - start_time, n
+
+
+def bench_cheeky_prime_test(implementation, limit):
+    import numpy as np
+    from primes import cheeky_prime_test, cheeky_prime_test_array
+
+    start_time = perf_counter()
+    if implementation == "scalar":
+        for i in range(limit):
+            cheeky_prime_test(i)
+    else:
+        cheeky_prime_test_array(np.arange(limit, dtype=np.uint64))
+    return perf_counter() - start_time, limit
+
+
+CASES = {
+    "initialize": bench_initialize,
+    "simulation": bench_simulation,
+    "latency_lookup": bench_latency_lookup,
+    "reachability": bench_reachability,
+    "permute": bench_permute,
+    "cheeky_prime_test": bench_cheeky_prime_test,
+}
+
+
+def default_suite(node_counts=NODE_COUNTS, strategies=STRATEGY_NAMES):
+    suite = []
+    for strategy in strategies:
+        for node_count in node_counts:
+            suite.append(("initialize", {"strategy": strategy, "node_count": node_count}))
+            suite.append(("simulation", {"strategy": strategy, "node_count": node_count}))
+    for api in ["name", "id"]:
+        suite.append(("latency_lookup", {"api": api, "count": 1000000}))
+    for graph_type in ["hamiltonian", "random", "tree"]:
+        for n in [101, 1001]:
+            suite.append(("reachability", {"graph_type": graph_type, "n": n}))
+    suite.append(("permute", {"implementation": "scalar", "count": 100000}))
+    suite.append(("permute", {"implementation": "array", "count": 10000000}))
+    suite.append(("cheeky_prime_test", {"implementation": "scalar", "limit": 1000000}))
+    suite.append(("cheeky_prime_test", {"implementation": "array", "limit": 10000000}))
+    return suite
+
+
+def case_id(name, params):
+    return name + "[" + ",".join(f"{key}={value}" for key, value in params.items()) + "]"
+
+
+def peak_rss_mb():
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def run_case(name, params):
+    wall_time, events = CASES[name](**params)
+    return {"wall_time": wall_time, "events": events,
+            "events_per_second": events / wall_time if wall_time else None,
+            "peak_rss_mb": peak_rss_mb()}
+
+
+def run_case_in_subprocess(name, params):
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), "--run-case", name, json.dumps(params)],
+                            check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run_suite(suite, repeat=3):
+    # Median of repeat runs for time and throughput, largest peak RSS
+    results = {}
+    for name, params in suite:
+        runs = [run_case_in_subprocess(name, params) for _ in range(repeat)]
+        wall_time = statistics.median(run["wall_time"] for run in runs)
+        events = runs[0]["events"]
+        result = {"wall_time": wall_time, "wall_time_min": min(run["wall_time"] for run in runs),
+                  "events": events, "events_per_second": events / wall_time if wall_time else None,
+                  "peak_rss_mb": max(run["peak_rss_mb"] for run in runs), "repeat": repeat}
+        results[case_id(name, params)] = result
+        print(f"{case_id(name, params)}: {wall_time:.3f}s, "
+              f"{result['events_per_second']:.3g} events/s, {result['peak_rss_mb']:.0f} MiB", flush=True)
+    return {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "platform": platform.platform(),
+        "cases": results,
+    }
+
+
+def find_regressions(results, baseline, threshold=0.2, min_delta=0.05, min_rss_delta=16):
+    # (case, metric, baseline value, current value) for every case that is worse
+    # than the baseline by more than threshold. Timings that moved by less than
+    # min_delta seconds and peak RSS that moved by less than min_rss_delta MiB
+    # are noise, whatever the ratio.
+    regressions = []
+    for case, current in results["cases"].items():
+        previous = baseline["cases"].get(case)
+        if previous is None:
+            continue
+        if current["wall_time"] - previous["wall_time"] > min_delta:
+            if current["wall_time"] > previous["wall_time"] * (1 + threshold):
+                regressions.append((case, "wall_time", previous["wall_time"], current["wall_time"]))
+            if previous["events_per_second"] and current["events_per_second"] < previous["events_per_second"] * (1 - threshold):
+                regressions.append((case, "events_per_second", previous["events_per_second"], current["events_per_second"]))
+        if current["peak_rss_mb"] - previous["peak_rss_mb"] > min_rss_delta and \
+                current["peak_rss_mb"] > previous["peak_rss_mb"] * (1 + threshold):
+            regressions.append((case, "peak_rss_mb", previous["peak_rss_mb"], current["peak_rss_mb"]))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scaling benchmarks for the simulator and analysis scripts")
+    parser.add_argument("--output", default="benchmark_results.json", help="JSON file to write results to")
+    parser.add_argument("--baseline", default="benchmark_baseline.json", help="Stored baseline to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Relative change that counts as a regression")
+    parser.add_argument("--min-delta", type=float, default=0.05,
+                        help="Seconds a case must slow down by before it can count as a regression")
+    parser.add_argument("--min-rss-delta", type=float, default=16,
+                        help="MiB peak RSS must grow by before it can count as a regression")
+    parser.add_argument("--node-counts", nargs="+", type=int, default=NODE_COUNTS)
+    parser.add_argument("--strategies", nargs="+", choices=STRATEGY_NAMES, default=STRATEGY_NAMES)
+    parser.add_argument("--cases", nargs="+", choices=CASES, default=list(CASES))
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per case; the median is compared")
+    parser.add_argument("--run-case", nargs=2, metavar=("NAME", "PARAMS"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_case:
+        # Child process: run one case and print its result as the last line
+        name, params = args.run_case
+        print(json.dumps(run_case(name, json.loads(params))))
+        sys.exit()
+
+    suite = [(name, params) for name, params in default_suite(args.node_counts, args.strategies) if name in args.cases]
+    results = run_suite(suite, args.repeat)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = find_regressions(results, baseline, args.threshold, args.min_delta, args.min_rss_delta)
+        for case, metric, previous, current in regressions:
+            print(f"REGRESSION {case} {metric}: {previous:.4g} -> {current:.4g}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {args.baseline}")
@@ -0,0 +1,292 @@
+from typing import NamedTuple
+import math
+import numpy as np
+from capacity import EgressQueues
+from inflight import CalendarQueue
+from transmit import Transmitter
+
+# Many overlapping broadcasts through one network. Each node follows the same
+# rules as Node does for a single message, for every message independently: on
+# the first packet of a message it drops the sender from its forward list, sends
+# to the last remaining recipient, drops any other senders of that message in the
+# same tick, and then sends to everyone left.
+#
+# Nothing is kept per (node, message) in Python objects. Whether a node has a
+# message is one byte in that message's row, which only exists from the
+# message's start until every node has it or its last packet has landed, so
+# memory follows the messages in flight rather than all of them. Forward lists
+# are only looked up while a node handles its first packet of a message.
+
+class Broadcast(NamedTuple):
+    origin: int
+    start_tick: int
+    message: object
+
+
+class BroadcastSimulator:
+    def __init__(self, network, broadcasts, in_flight=None, trace=None):
+        # network must be initialized; only its nodes, strategies, latency model,
+        # loss sampler and capacity model are used. Packets go through the same
+        # Transmitter as the network's own, with a queue and egress state of
+        # their own.
+        self.network = network
+        self.broadcasts = sorted(broadcasts, key=lambda broadcast: broadcast.start_tick)
+        self.node_count = len(network.node_list)
+        self.in_flight = in_flight if in_flight is not None else CalendarQueue()
+        self.trace = trace
+        self.egress = EgressQueues(network.capacity, self.node_count) if network.capacity is not None else None
+        self.transmitter = Transmitter(network.latency_model, network.location_ids.tolist(), self.in_flight,
+                                       network.loss_sampler, self.egress, trace)
+        self.tick_count = 0
+        self.next_broadcast = 0
+
+        message_count = len(self.broadcasts)
+        self.have = [None] * message_count
+        self.outstanding = [0] * message_count
+        self.reached = [0] * message_count
+        self.completion_ticks = [None] * message_count
+        self.sent = [0] * message_count
+        self.lost = [0] * message_count
+        self.duplicates = [0] * message_count
+
+        # Histogram of ticks from a message's start to each node's first copy
+        self.arrival_latencies = []
+
+        # Inbox entries (message index * node_count + source) for the current tick
+        self.inboxes = {}
+
+        # Any of these messages may overlap, so per-message caches must hold them all
+        for node in network.node_list:
+            node.strategy.reserve_messages(message_count)
+
+    def send(self, message_index, source_id, destination_id):
+        self.sent[message_index] += 1
+        if self.transmitter.send(self.tick_count, source_id, destination_id, message_index):
+            self.outstanding[message_index] += 1
+        else:
+            self.lost[message_index] += 1
+
+    def add_arrival(self, message_index, node_id):
+        self.have[message_index][node_id] = 1
+        self.reached[message_index] += 1
+
+        latency = self.tick_count - self.broadcasts[message_index].start_tick
+        if latency >= len(self.arrival_latencies):
+            self.arrival_latencies.extend([0] * (latency + 1 - len(self.arrival_latencies)))
+        self.arrival_latencies[latency] += 1
+
+        if self.reached[message_index] == self.node_count:
+            # Every later packet of this message is a duplicate
+            self.completion_ticks[message_index] = self.tick_count
+            self.have[message_index] = None
+
+    def forward_list(self, message_index, node_id):
+        node = self.network.node_list[node_id]
+        return node.strategy.forward_list(self.broadcasts[message_index].message)
+
+    def start(self, message_index):
+        # The origin sends to its whole list, last position first
+        origin = self.broadcasts[message_index].origin
+        self.have[message_index] = bytearray(self.node_count)
+        self.add_arrival(message_index, origin)
+        forward_list = self.forward_list(message_index, origin)
+        for position in range(len(forward_list) - 1, -1, -1):
+            self.send(message_index, origin, forward_list.target(position))
+
+    def handle_inbox(self, node_id, entries):
+        # Forward lists and remaining-recipient bitmaps of the messages this node
+        # got for the first time this tick, in the order it got them
+        pending = {}
+        for entry in entries:
+            message_index, source_id = divmod(entry, self.node_count)
+            have = self.have[message_index]
+            # While packets of a message are still landing, its row is only
+            # gone once every node has it
+            if have is None or have[node_id]:
+                self.duplicates[message_index] += 1
+                state = pending.get(message_index)
+                if state is not None:
+                    state[1] = state[0].drop_sender(state[1], source_id)
+                continue
+
+            self.add_arrival(message_index, node_id)
+            forward_list = self.forward_list(message_index, node_id)
+            remaining = forward_list.drop_sender((1 << len(forward_list)) - 1, source_id)
+            if remaining:
+                position = remaining.bit_length() - 1
+                remaining ^= 1 << position
+                self.send(message_index, node_id, forward_list.target(position))
+            pending[message_index] = [forward_list, remaining]
+
+        for message_index, (forward_list, remaining) in pending.items():
+            while remaining:
+                position = remaining.bit_length() - 1
+                remaining ^= 1 << position
+                self.send(message_index, node_id, forward_list.target(position))
+
+    def advance(self, tick_count):
+        self.tick_count = tick_count
+        node_count = self.node_count
+
+        # Packets sent on earlier ticks land first, then new broadcasts start,
+        # then nodes handle their inboxes in node order
+        touched = set()
+        for entry, destination_id in self.transmitter.deliver(tick_count):
+            self.inboxes.setdefault(destination_id, []).append(entry)
+            message_index = entry // node_count
+            self.outstanding[message_index] -= 1
+            touched.add(message_index)
+
+        while self.next_broadcast < len(self.broadcasts) and \
+                self.broadcasts[self.next_broadcast].start_tick <= tick_count:
+            self.start(self.next_broadcast)
+            touched.add(self.next_broadcast)
+            self.next_broadcast += 1
+
+        inboxes = self.inboxes
+        self.inboxes = {}
+        for node_id in sorted(inboxes):
+            self.handle_inbox(node_id, inboxes[node_id])
+
+        # A message with nothing left in flight can't reach anyone else
+        for message_index in touched:
+            if self.outstanding[message_index] == 0:
+                self.have[message_index] = None
+
+    def is_active(self):
+        return bool(self.in_flight) or self.next_broadcast < len(self.broadcasts)
+
+    def run(self):
+        # Event-driven: jump to the next arrival or broadcast start
+        if self.broadcasts:
+            self.advance(self.broadcasts[0].start_tick)
+        while self.is_active():
+            next_tick = math.inf
+            if self.in_flight:
+                next_tick = math.ceil(self.in_flight.next_time())
+            if self.next_broadcast < len(self.broadcasts):
+                next_tick = min(next_tick, self.broadcasts[self.next_broadcast].start_tick)
+            self.advance(max(self.tick_count + 1, next_tick))
+        if self.trace is not None:
+            self.trace.flush()
+        return self.report()
+
+    def report(self, percentiles=(50, 90, 99)):
+        start_ticks = np.array([broadcast.start_tick for broadcast in self.broadcasts])
+        completed = np.array([tick is not None for tick in self.completion_ticks], dtype=bool)
+        completion_ticks = np.array([tick for tick in self.completion_ticks if tick is not None])
+        completion_latency = completion_ticks - start_ticks[completed]
+
+        # Percentiles of the arrival histogram, over every (node, message) reached
+        histogram = np.array(self.arrival_latencies)
+        cumulative = np.cumsum(histogram)
+
+        total_sent = sum(self.sent)
+        span = (self.tick_count - start_ticks.min()) if len(start_ticks) else 0
+        return {
+            "messages": len(self.broadcasts),
+            "completed": int(completed.sum()),
+            "completion_latency": {f"p{p}": float(np.percentile(completion_latency, p)) if len(completion_latency) else None
+                                   for p in percentiles},
+            "arrival_latency": {f"p{p}": int(np.searchsorted(cumulative, cumulative[-1] * p / 100)) if len(cumulative) else None
+                                for p in percentiles},
+            "total_time": span,
+            "total_packets": total_sent,
+            "lost_packets": sum(self.lost),
+            "duplicate_packets": sum(self.duplicates),
+            "packets_per_message": total_sent / len(self.broadcasts) if self.broadcasts else 0,
+            "messages_per_second": 1000 * int(completed.sum()) / span if span else None,
+            "packets_per_second": 1000 * total_sent / span if span else None,
+        }
+
+
+def poisson_broadcasts(node_count, rate, duration, seed=None):
+    # Broadcasts from random origins arriving at rate messages per second for
+    # duration ms, with each start rounded to the tick
+    rng = np.random.default_rng(seed)
+    gaps = rng.exponential(1000 / rate, size=int(rate * duration / 1000 * 1.5) + 10)
+    starts = np.cumsum(gaps)
+    starts = starts[starts < duration].astype(np.int64)
+    origins = rng.integers(0, node_count, size=len(starts))
+    return [Broadcast(int(origin), int(start), i) for i, (origin, start) in enumerate(zip(origins, starts))]
+
+
+if __name__ == "__main__":
+    import io
+    import os
+    import random
+    import tempfile
+    import time
+    from contextlib import redirect_stdout
+    from network import Network
+    from latency import LatencyModel
+    from latency_data import latency_data
+    from node import Node
+    from gossip import GreedyGossipStrategy, RandomGossipStrategy, HalfGreedyGossipStrategy
+    from hamiltonian import HamiltonionStrategy
+    from permuted import PermutationStrategy
+    from netsim import run_simulation
+    from tracing import TraceRecorder, load_trace, first_arrivals
+
+    lat = LatencyModel(latency_data, provider_list=["AWS", "Azure", "Google"])
+    strategies = [GreedyGossipStrategy, RandomGossipStrategy, HalfGreedyGossipStrategy,
+                  HamiltonionStrategy, PermutationStrategy]
+
+    # A single broadcast follows exactly the same packets as the Node simulation
+    node_count = 300
+    path = os.path.join(tempfile.mkdtemp(), "broadcast.bin")
+    for strategy in strategies:
+        for _ in range(3):
+            locations = random.choices(lat.locations, k=node_count)
+            nodes = [Node(locations[i], i, strategy(10)) for i in range(node_count)]
+            network = Network(nodes, lat)
+            network.initialize()
+
+            with TraceRecorder(path) as recorder:
+                report = BroadcastSimulator(network, [Broadcast(0, 0, "start")], trace=recorder).run()
+            with redirect_stdout(io.StringIO()):
+                completion_time = run_simulation(network, 0, event_driven=True)
+
+            expected = [0 if i == 0 else np.inf if node.first_packet_tick is None else node.first_packet_tick
+                        for i, node in enumerate(nodes)]
+            assert np.array_equal(first_arrivals(load_trace(path), node_count), expected)
+            assert report["total_packets"] == network.total_packets
+            assert report["total_time"] == network.tick_count
+            assert report["completed"] == (completion_time is not None)
+    print("Single broadcasts match the Node simulation!")
+
+    # With heavy loss some messages never reach everyone; their rows still go
+    # once their last packet lands, and permuted plans stay cached for all of them
+    from permuted import message_plan
+    lossy = LatencyModel(latency_data, provider_list=["AWS", "Azure", "Google"], max_loss=0.3)
+    for strategy in [RandomGossipStrategy, PermutationStrategy]:
+        nodes = [Node(locations[i], i, strategy(3)) for i in range(node_count)]
+        network = Network(nodes, lossy, seed=1)
+        network.initialize()
+        simulator = BroadcastSimulator(network, poisson_broadcasts(node_count, rate=1000, duration=200, seed=2))
+        report = simulator.run()
+        assert report["completed"] < report["messages"] and report["lost_packets"] > 0
+        assert all(row is None for row in simulator.have) and not any(simulator.outstanding)
+    assert message_plan.cache_info().maxsize >= report["messages"]
+    print("Rows of finished and stalled messages are freed!")
+
+    # Overlapping broadcasts arriving at 1000 messages per second. A random
+    # overlay can leave a node nobody forwards to, and then no message completes.
+    def percentiles(latencies):
+        return "/".join("-" if value is None else f"{value:.0f}" for value in latencies.values())
+
+    node_count = 2000
+    locations = random.choices(lat.locations, k=node_count)
+    for strategy in [RandomGossipStrategy, HamiltonionStrategy, PermutationStrategy]:
+        nodes = [Node(locations[i], i, strategy(8)) for i in range(node_count)]
+        network = Network(nodes, lat)
+        network.initialize()
+
+        broadcasts = poisson_broadcasts(node_count, rate=1000, duration=100, seed=1)
+        start_time = time.time()
+        report = BroadcastSimulator(network, broadcasts).run()
+        print(f"{strategy.__name__}: {report['completed']}/{report['messages']} messages, "
+              f"completion p50/p90/p99 {percentiles(report['completion_latency'])} ticks, "
+              f"arrival {percentiles(report['arrival_latency'])} ticks, "
+              f"{report['packets_per_second']:.3g} packets/s simulated, "
+              f"{time.time() - start_time:.1f}s wall")
@@ -0,0 +1,104 @@
+import numpy as np
+
+
+class CapacityModel:
+    # Per-node uplink bandwidth in Mbit/s, either one value for every node or a
+    # sequence with one per node, and a fixed packet size in bytes. A node sends
+    # one packet at a time: each packet waits behind the ones it queued before,
+    # holds the link for packet_size / bandwidth, and only then starts its hop
+    # latency.
+    def __init__(self, bandwidth, packet_size=1024):
+        bandwidth = np.asarray(bandwidth, dtype=np.float64)
+        if np.any(bandwidth <= 0):
+            raise ValueError("bandwidth must be positive")
+        if packet_size <= 0:
+            raise ValueError("packet_size must be positive")
+        self.bandwidth = bandwidth
+        self.packet_size = packet_size
+
+    def transmission_times(self, node_count):
+        # Ticks (ms) each node's uplink is busy per packet
+        times = np.broadcast_to(self.packet_size * 8 / (self.bandwidth * 1000), (node_count,))
+        return times.tolist()
+
+
+class EgressQueues:
+    # FIFO egress queue of every node, kept as the time its uplink next goes
+    # idle, so a send is O(1) and no packets are buffered.
+    def __init__(self, capacity, node_count):
+        self.transmission_times = capacity.transmission_times(node_count)
+        self.free_times = [0.0] * node_count
+        self.queueing_delay = 0.0
+
+    def departure_time(self, node_id, time):
+        # When a packet queued at time has finished going out on the wire
+        start = self.free_times[node_id]
+        if start < time:
+            start = time
+        else:
+            self.queueing_delay += start - time
+        departure = start + self.transmission_times[node_id]
+        self.free_times[node_id] = departure
+        return departure
+
+
+if __name__ == "__main__":
+    import io
+    import random
+    from contextlib import redirect_stdout
+    from network import Network
+    from latency import LatencyModel
+    from latency_data import latency_data
+    from node import Node
+    from gossip import RandomGossipStrategy
+    from hamiltonian import HamiltonionStrategy
+    from netsim import run_simulation
+    from dissemination import disseminate
+    from broadcast import BroadcastSimulator, Broadcast
+
+    lat = LatencyModel(latency_data, provider_list=["AWS", "Azure", "Google"])
+    node_count = 1000
+    locations = random.choices(lat.locations, k=node_count)
+
+    def simulate(strategy, degree, capacity):
+        random.seed(1)
+        nodes = [Node(locations[i], i, strategy(degree)) for i in range(node_count)]
+        network = Network(nodes, lat, capacity=capacity)
+        network.initialize()
+        with redirect_stdout(io.StringIO()):
+            completion_time = run_simulation(network, 0, event_driven=True)
+        return network, completion_time
+
+    # The Node simulation and BroadcastSimulator queue the same packets
+    for strategy in [RandomGossipStrategy, HamiltonionStrategy]:
+        for bandwidth in [1000, 10]:
+            network, completion_time = simulate(strategy, 10, CapacityModel(bandwidth, packet_size=64 * 1024))
+            queueing_delay = network.egress.queueing_delay
+            simulator = BroadcastSimulator(network, [Broadcast(0, 0, "start")])
+            report = simulator.run()
+            assert report["total_packets"] == network.total_packets
+            assert report["total_time"] == network.tick_count
+            assert simulator.egress.queueing_delay == queueing_delay
+            try:
+                disseminate(network, 0)
+                assert False, "disseminate should refuse a capacity model"
+            except ValueError:
+                pass
+
+    # A node's packets queue one behind the other
+    egress = EgressQueues(CapacityModel([8, 80], packet_size=1000), 2)
+    assert [egress.departure_time(0, 0) for _ in range(3)] == [1.0, 2.0, 3.0]
+    assert egress.departure_time(1, 5) == 5.1 and egress.departure_time(0, 10) == 11.0
+    assert egress.queueing_delay == 3.0
+    print("Capacity model checks passed!")
+
+    # Degree against completion time once the uplinks fill up
+    for bandwidth in [None, 100, 10]:
+        capacity = CapacityModel(bandwidth, packet_size=64 * 1024) if bandwidth else None
+        for strategy in [RandomGossipStrategy, HamiltonionStrategy]:
+            for degree in [4, 8, 16, 32]:
+                network, completion_time = simulate(strategy, degree, capacity)
+                queueing = network.egress.queueing_delay / network.total_packets if capacity else 0
+                print(f"{bandwidth or 'unlimited'} Mbit/s {strategy.__name__} degree {degree}: "
+                      f"completion {completion_time}, amplification {network.total_packets / node_count:.1f}, "
+                      f"mean queueing {queueing:.1f} ticks")
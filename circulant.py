@@ -0,0 +1,105 @@
+import numpy as np
+
+# Implicit circulant graph: nodes 0..n-1, where node v links to v + s (mod n) for
+# every stride s. The graph is fully determined by n and the strides, so neighbors
+# are generated arithmetically and nothing per node or per edge is stored. It has
+# the same successors()/node_count interface as topology.Topology.
+
+class CirculantGraph:
+    def __init__(self, n, strides, directed=True, closed=True):
+        self.node_count = n
+        self.strides = [int(s) for s in strides]
+        self.directed = directed
+
+        # An open graph drops the edge that would close each stride's cycle back
+        # into node 0, which leaves one Hamiltonian path 0, s, 2s, ... per stride.
+        if not closed and not directed:
+            raise ValueError("Only directed circulant graphs can be open")
+        self.closed = closed
+
+        # Distinct, non-zero offsets to the neighbors of any node
+        offsets = [s % n for s in self.strides]
+        if not directed:
+            offsets += [(-s) % n for s in self.strides]
+        self.offsets = np.array(sorted(set(offsets) - {0}), dtype=np.int64)
+
+    def neighbors(self, v):
+        targets = (v + self.offsets) % self.node_count
+        if not self.closed:
+            targets = targets[targets != 0]
+        return targets
+
+    def successors(self, nodes):
+        # Out-edges of all the given nodes at once, as (index into nodes, target)
+        nodes = np.asarray(nodes, dtype=np.int64)
+        targets = (nodes[:, None] + self.offsets[None, :]) % self.node_count
+        owners = np.broadcast_to(np.arange(len(nodes))[:, None], targets.shape)
+        if self.closed:
+            return owners.ravel(), targets.ravel()
+        keep = targets != 0
+        return owners[keep], targets[keep]
+
+    def degrees(self):
+        # In + out degree for directed graphs, like networkx's DiGraph.degree
+        k = len(self.offsets)
+        if not self.directed:
+            return np.full(self.node_count, k, dtype=np.int64)
+
+        degrees = np.full(self.node_count, 2 * k, dtype=np.int64)
+        if not self.closed:
+            np.subtract.at(degrees, (-self.offsets) % self.node_count, 1)
+            degrees[0] -= k
+        return degrees
+
+    def number_of_edges(self):
+        if self.directed:
+            return self.node_count * len(self.offsets) - (0 if self.closed else len(self.offsets))
+        return self.node_count * len(self.offsets) // 2
+
+    def edges(self, nodes=None):
+        # Edge arrays (sources, targets) for the given nodes, or for all of them
+        if nodes is None:
+            nodes = np.arange(self.node_count)
+        nodes = np.asarray(nodes, dtype=np.int64)
+        owners, targets = self.successors(nodes)
+        return nodes[owners], targets
+
+    def to_networkx(self):
+        import networkx as nx
+
+        G = nx.DiGraph() if self.directed else nx.Graph()
+        G.add_nodes_from(range(self.node_count))
+        src, dst = self.edges()
+        G.add_edges_from(zip(src.tolist(), dst.tolist()))
+        return G
+
+    def __repr__(self):
+        return (f"CirculantGraph(n={self.node_count}, strides={self.strides}, "
+                f"directed={self.directed}, closed={self.closed})")
+
+
+if __name__ == "__main__":
+    import networkx as nx
+
+    # Compare against the explicit networkx constructions in graphsim and connectivity
+    for n in [7, 31, 101]:
+        for strides in [[1], [1, 3], [2, 5, 9]]:
+            path = nx.DiGraph()
+            for c in strides:
+                for i in range(n - 1):
+                    path.add_edge(i * c % n, (i + 1) * c % n)
+            implicit = CirculantGraph(n, strides, closed=False)
+            assert set(path.edges()) == set(implicit.to_networkx().edges())
+            assert implicit.number_of_edges() == path.number_of_edges()
+            assert list(implicit.degrees()) == [path.degree(v) for v in range(n)]
+
+            cycle = nx.Graph()
+            for i in range(n):
+                for c in strides:
+                    cycle.add_edge(i * c % n, (i + 1) * c % n)
+            implicit = CirculantGraph(n, strides, directed=False)
+            assert nx.utils.edges_equal(cycle.edges(), implicit.to_networkx().edges())
+            assert implicit.number_of_edges() == cycle.number_of_edges()
+            assert list(implicit.degrees()) == [cycle.degree(v) for v in range(n)]
+
+    print("All circulant graph tests passed!")
@@ -1,39 +1,135 @@
 import networkx as nx
 import math
+import numpy as np
 from itertools import combinations
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import maximum_flow
+from circulant import CirculantGraph
+from numtheory import first_coprimes
 
-def get_coprimes(n, count):
-    def gcd(a, b):
-        while b:
-            a, b = b, a % b
-        return a
-    
-    coprimes = []
-    num = 1
-    while len(coprimes) < count:
-        if gcd(num, n) == 1:
-            coprimes.append(num)
-        num += 1
-    return coprimes
-
-
-n = 201
-G = nx.Graph(nodes=range(n))
-cycles = get_coprimes(n, math.ceil(n / 6))
-
-print(cycles)
-
-for i in range(n):
-    for c in cycles:
-        G.add_edge(i*c % n, (i + 1)*c % n)
-
-# Find the minimum node cut
-node_cut = nx.minimum_node_cut(G)
-print(f"Minimum node cut: {len(node_cut)} {node_cut}")
-girth = nx.girth(G)
-print(f"Girth: {girth}")
-degrees = [d for n, d in G.degree()]
-minimum_degree = min(degrees)
-print(f"Minimum degree: {minimum_degree}")
-maximum_degree = max(degrees)
-print(f"Maximum degree: {maximum_degree}")
+# Undirected circulant graphs are vertex-transitive (v -> v + a is an automorphism)
+# and symmetric under v -> -v, which fixes node 0. So every question about all
+# pairs of nodes only has to be asked from node 0, and only for the targets
+# 1..n/2: the other targets are mirror images.
+
+def bfs_from_zero(graph):
+    # Distances and BFS-tree parents from node 0
+    dist = np.full(graph.node_count, -1, dtype=np.int64)
+    parent = np.full(graph.node_count, -1, dtype=np.int64)
+    dist[0] = 0
+    frontier = np.array([0])
+    level = 0
+    while len(frontier):
+        level += 1
+        owners, targets = graph.successors(frontier)
+        new = dist[targets] < 0
+        targets, first = np.unique(targets[new], return_index=True)
+        dist[targets] = level
+        parent[targets] = frontier[owners[new][first]]
+        frontier = targets
+    return dist, parent
+
+def girth(graph):
+    # Shortest cycle through node 0, which is the girth since every node lies on
+    # a shortest cycle: the smallest dist[u] + dist[v] + 1 over non-tree edges
+    dist, parent = bfs_from_zero(graph)
+    src, dst = graph.edges(np.flatnonzero(dist >= 0))
+    non_tree = (parent[dst] != src) & (parent[src] != dst)
+    if not non_tree.any():
+        return math.inf
+    return int((dist[src] + dist[dst] + 1)[non_tree].min())
+
+def split_node_network(graph):
+    # Flow network where node v becomes v_in = 2v -> v_out = 2v + 1 with capacity
+    # 1, and every edge v -w becomes v_out -> w_in with capacity n. A max flow from
+    # 0_out to t_in is the number of node-disjoint paths from 0 to t.
+    n = graph.node_count
+    src, dst = graph.edges()
+    rows = np.concatenate([2 * np.arange(n), 2 * src + 1])
+    cols = np.concatenate([2 * np.arange(n) + 1, 2 * dst])
+    capacity = np.concatenate([np.ones(n, dtype=np.int32), np.full(len(src), n, dtype=np.int32)])
+    return csr_matrix((capacity, (rows, cols)), shape=(2 * n, 2 * n))
+
+def minimum_node_cut(graph):
+    # Smallest local connectivity from node 0 to any node it isn't adjacent to,
+    # together with a cut achieving it
+    n = graph.node_count
+    network = split_node_network(graph)
+    adjacent = np.zeros(n, dtype=bool)
+    adjacent[graph.neighbors(0)] = True
+    adjacent[0] = True
+
+    best, best_target, best_flow = math.inf, None, None
+    for t in range(1, n // 2 + 1):
+        if adjacent[t]:
+            continue
+        result = maximum_flow(network, 1, 2 * t)
+        if result.flow_value < best:
+            best, best_target, best_flow = result.flow_value, t, result.flow
+
+    if best_target is None:
+        # Complete graph, no pair can be separated
+        return n - 1, set()
+
+    # The cut is every node whose in -> out arc crosses from the part of the
+    # residual network reachable from the source to the rest
+    residual = network - best_flow
+    residual.data[residual.data < 0] = 0
+    residual.eliminate_zeros()
+    reachable = np.zeros(2 * n, dtype=bool)
+    reachable[1] = True
+    frontier = [1]
+    while frontier:
+        u = frontier.pop()
+        for v in residual.indices[residual.indptr[u]:residual.indptr[u + 1]]:
+            if not reachable[v]:
+                reachable[v] = True
+                frontier.append(v)
+    cut = {v for v in range(n) if reachable[2 * v] and not reachable[2 * v + 1]}
+    return int(best), cut
+
+def connectivity_report(graph):
+    degrees = graph.degrees()
+    dist, _ = bfs_from_zero(graph)
+    connectivity, cut = minimum_node_cut(graph)
+    return {
+        "n": graph.node_count,
+        "strides": graph.strides,
+        "connectivity": connectivity,
+        "node_cut": sorted(cut),
+        "girth": girth(graph),
+        "minimum_degree": int(degrees.min()),
+        "maximum_degree": int(degrees.max()),
+        "diameter": int(dist.max()) if (dist >= 0).all() else math.inf,
+    }
+
+if __name__ == "__main__":
+    # Check against networkx on small graphs
+    for n in [12, 25, 31, 40]:
+        for count in [1, 2, 3, 5]:
+            C = CirculantGraph(n, first_coprimes(n, count), directed=False)
+            G = C.to_networkx()
+            report = connectivity_report(C)
+            assert report["connectivity"] == nx.node_connectivity(G)
+            if report["node_cut"]:
+                H = G.copy()
+                H.remove_nodes_from(report["node_cut"])
+                assert not nx.is_connected(H)
+            assert report["girth"] == nx.girth(G)
+            assert report["diameter"] == nx.diameter(G)
+
+    n = 201
+    cycles = first_coprimes(n, math.ceil(n / 6))
+
+    print(cycles.tolist())
+
+    # Every edge (i*c, (i+1)*c) joins v and v + c, so the graph is the circulant
+    # graph on the strides
+    C = CirculantGraph(n, cycles, directed=False)
+    report = connectivity_report(C)
+
+    print(f"Minimum node cut: {report['connectivity']} {set(report['node_cut'])}")
+    print(f"Girth: {report['girth']}")
+    print(f"Minimum degree: {report['minimum_degree']}")
+    print(f"Maximum degree: {report['maximum_degree']}")
+    print(f"Diameter: {report['diameter']}")
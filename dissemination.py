@@ -0,0 +1,167 @@
+from typing import NamedTuple
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+
+# Closed-form version of run_simulation for strategies that forward to a fixed
+# neighbor list on first receipt (GreedyGossipStrategy, RandomGossipStrategy,
+# HalfGreedyGossipStrategy, HamiltonionStrategy, and PermutationStrategy for a
+# given message). For these, the tick a node first receives the message is its
+# shortest path from the start node, where a hop takes max(1, ceil(latency))
+# ticks, and the packet count only depends on which packets land on the same
+# tick as a node's first one.
+
+class Dissemination(NamedTuple):
+    arrival_ticks: np.ndarray
+    completed_nodes: int
+    completion_time: int
+    total_time: int
+    total_packets: int
+
+
+def disseminate(network, start_node_id, topology=None):
+    # Strategies that compute their forward lists per message pass the message's
+    # topology in; everything else uses the one built by Network.initialize()
+    if network.latency_model.has_loss:
+        raise ValueError("disseminate requires a latency model without packet loss")
+    if network.capacity is not None:
+        # Egress queueing makes arrival times depend on send order
+        raise ValueError("disseminate requires a network without a capacity model")
+    if topology is None:
+        topology = network.topology
+
+    node_count = len(network.node_list)
+    offsets = topology.offsets
+    dst = topology.neighbors.astype(np.int64)
+    degrees = np.diff(offsets)
+    src = np.repeat(np.arange(node_count), degrees)
+
+    # Hop latencies, and the number of ticks until the packet is picked up
+    location_ids = np.array([node.location_id for node in network.node_list])
+    latency = network.latency_model.latency_matrix(exact=True)[location_ids[src], location_ids[dst]]
+    weight = np.maximum(1, np.ceil(latency))
+
+    # Duplicate entries would be summed by csr_matrix, so keep one edge per pair
+    codes = src * node_count + dst
+    pair_codes, first_entry, pair_counts = np.unique(codes, return_index=True, return_counts=True)
+    pair_src = src[first_entry]
+    pair_dst = dst[first_entry]
+    pair_weight = weight[first_entry]
+    graph = csr_matrix((pair_weight, (pair_src, pair_dst)), shape=(node_count, node_count))
+    arrival_ticks = dijkstra(graph, directed=True, indices=start_node_id)
+    reached = np.isfinite(arrival_ticks)
+
+    # Packets that land on the same tick as the receiver's first one. A node that
+    # has been reached sends to everyone in its list except those that had already
+    # sent to it, and nobody can have sent to it before its first tick.
+    tie = reached[src] & (arrival_ticks[src] + weight == arrival_ticks[dst]) & (dst != start_node_id)
+    tie_src = src[tie]
+    tie_dst = dst[tie]
+
+    # The first packet in a node's inbox is the earliest exact arrival time, then
+    # the earliest send: earlier tick first, and within a tick in node order.
+    order = np.lexsort((tie_src, arrival_ticks[tie_src], arrival_ticks[tie_src] + latency[tie], tie_dst))
+    first_dst, first_index = np.unique(tie_dst[order], return_index=True)
+    first_sender = np.full(node_count, -1, dtype=np.int64)
+    first_sender[first_dst] = tie_src[order][first_index]
+
+    # Per (node, neighbor) pair counts: c = occurrences of the neighbor in the
+    # node's list, k = packets from that neighbor on the node's first tick.
+    tie_codes, tie_counts = np.unique(tie_dst * node_count + tie_src, return_counts=True)
+    k = np.zeros(len(pair_codes), dtype=np.int64)
+    if len(tie_codes):
+        position = np.minimum(np.searchsorted(tie_codes, pair_codes), len(tie_codes) - 1)
+        match = tie_codes[position] == pair_codes
+        k[match] = tie_counts[position[match]]
+    c = pair_counts
+
+    # The first packet removes its sender, then the last remaining recipient is sent
+    # to straight away. Later packets in the same tick remove their senders if
+    # they are still in the list.
+    is_first = first_sender[pair_src] == pair_dst
+    first_count = np.zeros(node_count, dtype=np.int64)
+    np.add.at(first_count, pair_src[is_first], c[is_first])
+    first_in_list = first_count > 0
+
+    has_neighbors = degrees > 0
+    last = np.full(node_count, -1, dtype=np.int64)
+    last[has_neighbors] = dst[offsets[1:][has_neighbors] - 1]
+    second_last = np.full(node_count, -1, dtype=np.int64)
+    has_two = degrees > 1
+    second_last[has_two] = dst[offsets[1:][has_two] - 2]
+
+    popped = np.where((last == first_sender) & (first_count == 1), second_last, last)
+    popped[degrees - first_in_list == 0] = -1
+
+    is_popped = popped[pair_src] == pair_dst
+    remaining = c - is_first - is_popped
+    removed = np.maximum(0, np.minimum(remaining, k - is_first))
+    sent = c - is_first - removed
+
+    # The start node sends to its whole list, and unreached nodes send nothing
+    from_start = pair_src == start_node_id
+    sent[from_start] = c[from_start]
+    sent[~reached[pair_src]] = 0
+
+    completed_nodes = int(reached.sum())
+    if completed_nodes == node_count:
+        completion_time = int(arrival_ticks.max())
+    else:
+        completion_time = None
+
+    # The run ends when the last packet is picked up
+    sent_pairs = sent > 0
+    if sent_pairs.any():
+        total_time = int((arrival_ticks[pair_src] + pair_weight)[sent_pairs].max())
+    else:
+        total_time = 0
+
+    return Dissemination(arrival_ticks, completed_nodes, completion_time, total_time, int(sent.sum()))
+
+
+if __name__ == "__main__":
+    import io
+    import random
+    import time
+    from contextlib import redirect_stdout
+    from network import Network
+    from latency import LatencyModel
+    from latency_data import latency_data
+    from node import Node
+    from gossip import GreedyGossipStrategy, RandomGossipStrategy, HalfGreedyGossipStrategy
+    from hamiltonian import HamiltonionStrategy
+    from netsim import run_simulation
+
+    # Cross-check against the packet simulation
+    node_count = 300
+    degree = 10
+    for multiplier in [1, 1.5, 1.37]:
+        lat = LatencyModel(latency_data, provider_list=["AWS", "Azure", "Google"],
+                           cross_provider_latency_multiplier=multiplier)
+        for strategy in [GreedyGossipStrategy, RandomGossipStrategy, HalfGreedyGossipStrategy, HamiltonionStrategy]:
+            for _ in range(5):
+                locations = random.choices(lat.locations, k=node_count)
+                nodes = [Node(locations[i], i, strategy(degree)) for i in range(node_count)]
+                network = Network(nodes, lat)
+                network.initialize()
+
+                start_time = time.time()
+                result = disseminate(network, 0)
+                analytic_time = time.time() - start_time
+
+                with redirect_stdout(io.StringIO()):
+                    completion_time = run_simulation(network, 0, event_driven=True)
+
+                first_ticks = [node.first_packet_tick for node in network.node_list]
+                first_ticks[0] = 0
+                expected = np.array([np.inf if t is None else t for t in first_ticks])
+                assert np.array_equal(result.arrival_ticks, expected)
+                assert result.completed_nodes == sum(1 for node in network.node_list if node.completed)
+                assert result.completion_time == completion_time
+                assert result.total_time == network.tick_count
+                assert result.total_packets == network.total_packets
+
+            print(f"{strategy.__name__} x{multiplier}: {result.completion_time} ticks, "
+                  f"{result.total_packets} packets, {analytic_time*1000:.2f}ms")
+
+    print("Analytic dissemination matches the simulation!")
@@ -0,0 +1,190 @@
+from typing import NamedTuple
+from itertools import product
+from multiprocessing import Pool
+import argparse
+import csv
+import os
+import random
+import numpy as np
+
+from capacity import CapacityModel
+from network import Network
+from latency import LatencyModel
+from latency_data import latency_data
+from node import Node
+from netsim import run_simulation
+import gossip
+import hamiltonian
+
+# Monte Carlo runner for run_simulation. Every run is a point of the parameter
+# grid, fanned out over a process pool, and written to a CSV file as soon as it
+# finishes so an interrupted experiment can be resumed from its partial output.
+
+STRATEGIES = {strategy.__name__: strategy for strategy in [
+    gossip.GreedyGossipStrategy,
+    gossip.RandomGossipStrategy,
+    gossip.HalfGreedyGossipStrategy,
+    hamiltonian.HamiltonionStrategy,
+]}
+
+# A bandwidth of 0 is an unconstrained network, where packet_size has no effect
+KEY_COLUMNS = ["strategy", "node_count", "degree", "providers", "multiplier", "bandwidth", "packet_size",
+               "seed", "start_node"]
+RESULT_COLUMNS = ["completion_time", "total_time", "total_packets", "lost_packets", "amplification"]
+
+
+class Run(NamedTuple):
+    strategy: str
+    node_count: int
+    degree: int
+    providers: tuple
+    multiplier: float
+    bandwidth: float
+    packet_size: int
+    seed: int
+    start_node: int
+
+    def key(self):
+        return (self.strategy, str(self.node_count), str(self.degree), "|".join(self.providers),
+                str(self.multiplier), str(self.bandwidth), str(self.packet_size), str(self.seed),
+                str(self.start_node))
+
+
+def make_grid(strategies, node_counts, degrees, provider_lists, multipliers, seeds, start_nodes=[0],
+              bandwidths=[0.0], packet_sizes=[1024]):
+    # Strategies can be given as classes or by class name
+    strategies = [s if isinstance(s, str) else s.__name__ for s in strategies]
+    return [Run(strategy, node_count, degree, tuple(providers), multiplier, bandwidth, packet_size, seed, start_node)
+            for strategy, node_count, degree, providers, multiplier, bandwidth, packet_size, seed, start_node
+            in product(strategies, node_counts, degrees, provider_lists, multipliers, bandwidths, packet_sizes,
+                       seeds, start_nodes)]
+
+
+# Latency models are read-only, so they are built once in the parent and handed
+# to each worker when it starts instead of being pickled with every run.
+latency_models = {}
+
+def init_worker(models):
+    latency_models.update(models)
+
+
+def build_latency_models(runs):
+    models = {}
+    for run in runs:
+        if (run.providers, run.multiplier) not in models:
+            models[(run.providers, run.multiplier)] = LatencyModel(latency_data,
+                provider_list=list(run.providers), cross_provider_latency_multiplier=run.multiplier)
+    return models
+
+
+def simulate(run):
+    lat = latency_models[(run.providers, run.multiplier)]
+
+    # Seed the module random generator, which the strategies use to pick neighbors
+    random.seed(run.seed)
+    locations = random.choices(lat.locations, k=run.node_count)
+    strategy = STRATEGIES[run.strategy]
+    nodes = [Node(locations[i], i, strategy(run.degree)) for i in range(run.node_count)]
+    capacity = CapacityModel(run.bandwidth, run.packet_size) if run.bandwidth else None
+    network = Network(nodes, lat, seed=run.seed, capacity=capacity)
+    network.initialize()
+
+    completion_time = run_simulation(network, run.start_node, event_driven=True, verbose=False)
+    return run, [completion_time if completion_time is not None else "",
+                 network.tick_count, network.total_packets, network.lost_packets,
+                 network.total_packets / run.node_count]
+
+
+def completed_keys(path):
+    if not os.path.exists(path):
+        return set()
+
+    # Drop a partially written last row left behind by an interrupted run
+    with open(path, "rb+") as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+
+    with open(path, newline="") as f:
+        reader = csv.DictReader(f)
+        if reader.fieldnames is not None and reader.fieldnames != KEY_COLUMNS + RESULT_COLUMNS:
+            raise ValueError(f"{path} has different columns than this version writes, use a new output file")
+        return {tuple(row[column] for column in KEY_COLUMNS) for row in reader}
+
+
+def run_grid(runs, path, processes=None):
+    # Skip the runs that are already in the output file
+    done = completed_keys(path)
+    pending = [run for run in runs if run.key() not in done]
+    print(f"{len(runs) - len(pending)}/{len(runs)} runs already done, {len(pending)} to go")
+
+    write_header = not os.path.exists(path) or os.path.getsize(path) == 0
+    with open(path, "a", newline="") as f:
+        writer = csv.writer(f)
+        if write_header:
+            writer.writerow(KEY_COLUMNS + RESULT_COLUMNS)
+
+        with Pool(processes, initializer=init_worker, initargs=(build_latency_models(pending),)) as pool:
+            for i, (run, result) in enumerate(pool.imap_unordered(simulate, pending)):
+                writer.writerow(list(run.key()) + result)
+                f.flush()
+                print(f"\r{i + 1}/{len(pending)}", end="", flush=True)
+    print()
+
+
+def summarize(path, percentiles=[5, 50, 95]):
+    # Percentiles of each result column per grid point, pooled over seeds and start nodes
+    grid_columns = KEY_COLUMNS[:-2]
+    groups = {}
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            key = tuple(row[column] for column in grid_columns)
+            groups.setdefault(key, []).append(row)
+
+    summary = []
+    for key, rows in groups.items():
+        entry = dict(zip(grid_columns, key))
+        entry["runs"] = len(rows)
+        completion_times = [float(row["completion_time"]) for row in rows if row["completion_time"] != ""]
+        entry["incomplete"] = len(rows) - len(completion_times)
+        for column, values in [("completion_time", completion_times),
+                               ("total_packets", [float(row["total_packets"]) for row in rows]),
+                               ("amplification", [float(row["amplification"]) for row in rows])]:
+            for p in percentiles:
+                entry[f"{column}_p{p}"] = float(np.percentile(values, p)) if values else float("nan")
+        summary.append(entry)
+    return summary
+
+
+def write_parquet(path, parquet_path):
+    import pyarrow.csv
+    import pyarrow.parquet
+    pyarrow.parquet.write_table(pyarrow.csv.read_csv(path), parquet_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Monte Carlo sweep over gossip strategies")
+    parser.add_argument("output", help="CSV file to stream results to (resumed if it exists)")
+    parser.add_argument("--strategies", nargs="+", choices=STRATEGIES,
+                        default=["RandomGossipStrategy", "HalfGreedyGossipStrategy", "HamiltonionStrategy"])
+    parser.add_argument("--node-counts", nargs="+", type=int, default=[300])
+    parser.add_argument("--degrees", nargs="+", type=int, default=[10])
+    parser.add_argument("--multipliers", nargs="+", type=float, default=[1.0])
+    parser.add_argument("--bandwidths", nargs="+", type=float, default=[0.0],
+                        help="Per-node uplink bandwidth in Mbit/s, 0 for unlimited")
+    parser.add_argument("--packet-sizes", nargs="+", type=int, default=[1024], help="Packet size in bytes")
+    parser.add_argument("--seeds", type=int, default=100)
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--parquet", help="Also write the full results to this Parquet file")
+    args = parser.parse_args()
+
+    runs = make_grid(args.strategies, args.node_counts, args.degrees, [["AWS", "Azure", "Google"]],
+                     args.multipliers, range(args.seeds), bandwidths=args.bandwidths,
+                     packet_sizes=args.packet_sizes)
+    run_grid(runs, args.output, args.processes)
+
+    for entry in summarize(args.output):
+        print(entry)
+
+    if args.parquet:
+        write_parquet(args.output, args.parquet)
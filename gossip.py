@@ -1,57 +1,100 @@
+from collections.abc import Sequence
+from bisect import bisect_right
 from strategy import Strategy
 import random
 import math
 
+
+class AvailableIds(Sequence):
+    # The ids in range(node_count) that are not excluded, in increasing order,
+    # without building the list. Index j maps to the j-th available id, so
+    # random.sample() over this picks exactly what it picks over the full list.
+    def __init__(self, node_count, excluded):
+        self.excluded = sorted(excluded)
+        self.length = node_count - len(self.excluded)
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, index):
+        if not 0 <= index < self.length:
+            raise IndexError("index out of range")
+        # Every excluded id at or below the answer shifts it up by one
+        shift = 0
+        while True:
+            skipped = bisect_right(self.excluded, index + shift)
+            if skipped == shift:
+                return index + shift
+            shift = skipped
+
 class GossipStrategy(Strategy):
     def __init__(self, degree=4):
         super().__init__()
         self.degree = degree
-        self.neighbors = []
 
-    def add_closest_neighbors(self, count):
-        possible_neighbors = [n for n in self.network.node_list if n != self.node and n not in self.neighbors]
-        lat = self.network.latency_model
+    def add_closest_neighbors(self, neighbors, count):
+        excluded = set(neighbors)
+        excluded.add(self.node.id)
+        if count <= 0:
+            return
 
-        self.neighbors.extend(sorted(possible_neighbors, key=lambda x: lat.get_latency(self.node.location, x.location))[:count])
+        for candidate in self.network.closest_nodes(self.node.location_id):
+            candidate = int(candidate)
+            if candidate not in excluded:
+                neighbors.append(candidate)
+                excluded.add(candidate)
+                count -= 1
+                if count == 0:
+                    break
 
-    def add_random_neighbors(self, count):
-        possible_neighbors = [n for n in self.network.node_list if n != self.node and n not in self.neighbors]
-        self.neighbors.extend(random.sample(possible_neighbors, count))
+    def add_random_neighbors(self, neighbors, count):
+        node_count = len(self.network.node_list)
+        excluded = set(neighbors)
+        excluded.add(self.node.id)
+        available = node_count - len(excluded)
+        if count < 0 or count > available:
+            raise ValueError("Sample larger than population or is negative")
 
-    def set_network(self, network, node_id):
-        super().set_network(network, node_id)
+        # random.sample() only touches the candidates it picks once the population
+        # is large, so this is O(count) there, and it draws the same neighbors as
+        # sampling the explicit candidate list for a given seed.
+        neighbors.extend(random.sample(AvailableIds(node_count, excluded), count))
 
     def get_forward_list(self, sender, codeword_id):
+        neighbors = self.neighbors
         if sender is None:
-            return self.neighbors
+            return neighbors
         else:
-            return [n for n in self.neighbors if n != sender]
-    
+            return neighbors[neighbors != sender.id]
+
 
 class GreedyGossipStrategy(GossipStrategy):
     def __init__(self, degree=4):
         super().__init__(degree)
-    
-    def set_network(self, network, node_id):
-        super().set_network(network, node_id)
-        self.add_closest_neighbors(self.degree)
+
+    def select_neighbors(self):
+        neighbors = []
+        self.add_closest_neighbors(neighbors, self.degree)
+        return neighbors
 
 class RandomGossipStrategy(GossipStrategy):
     def __init__(self, degree=4):
         super().__init__(degree)
-    
-    def set_network(self, network, node_id):
-        super().set_network(network, node_id)
-        self.add_random_neighbors(self.degree)
+
+    def select_neighbors(self):
+        neighbors = []
+        self.add_random_neighbors(neighbors, self.degree)
+        return neighbors
 
 class HalfGreedyGossipStrategy(GossipStrategy):
     def __init__(self, degree=4):
         super().__init__(degree)
-    
-    def set_network(self, network, node_id):
-        super().set_network(network, node_id)
-        self.add_closest_neighbors(math.floor(self.degree / 2))
-        self.add_random_neighbors(math.ceil(self.degree / 2))
+
+    def select_neighbors(self):
+        neighbors = []
+        self.add_closest_neighbors(neighbors, math.floor(self.degree / 2))
+        self.add_random_neighbors(neighbors, math.ceil(self.degree / 2))
+        return neighbors
 
 if __name__ == "__main__":
     from network import Network
@@ -64,10 +107,11 @@ if __name__ == "__main__":
 
     def print_neighbors(network):
         for node in greedyNetwork.node_list:
-            print(f"{node.id} - {node.location} neighbors:", [n.id for n in node.strategy.neighbors], end=" ")
-            print(f"Latencies: {[lat.get_latency(node.location, n.location) for n in node.strategy.neighbors]}")
-            assert len(node.strategy.neighbors) == 6, "Should have exactly 3 neighbors"
-            assert node not in node.strategy.neighbors, "Node shouldn't be its own neighbor"
+            neighbors = [network.node_list[i] for i in node.strategy.neighbors]
+            print(f"{node.id} - {node.location} neighbors:", [n.id for n in neighbors], end=" ")
+            print(f"Latencies: {[lat.get_latency(node.location, n.location) for n in neighbors]}")
+            assert len(neighbors) == 6, "Should have exactly 3 neighbors"
+            assert node not in neighbors, "Node shouldn't be its own neighbor"
 
     greedyNodes = [Node(locations[i], i, GreedyGossipStrategy(6)) for i in range(20)]
     greedyNetwork = Network(greedyNodes, lat)
@@ -86,3 +130,43 @@ if __name__ == "__main__":
     halfNetwork.initialize()
     print("Half")
     print_neighbors(halfNetwork)
+
+    # Seeded neighbor lists are the ones the original list-sampling code picked.
+    # Both random.sample() branches are covered: 50 nodes samples from a copied
+    # pool, 1000 nodes rejects repeated indices. Every node draws from the same
+    # generator, so the last node only matches if every earlier draw did.
+    baseline = {
+        (RandomGossipStrategy, 50): {
+            0: [25, 27, 3, 17, 33, 32, 26, 20, 31, 23],
+            1: [38, 14, 33, 9, 19, 46, 7, 40, 17, 35],
+            25: [39, 12, 45, 21, 10, 15, 14, 41, 29, 24],
+            49: [20, 2, 33, 9, 16, 38, 45, 24, 37, 18],
+        },
+        (RandomGossipStrategy, 1000): {
+            0: [865, 395, 777, 912, 431, 42, 266, 989, 524, 498],
+            1: [415, 941, 803, 850, 311, 992, 489, 367, 598, 914],
+            500: [446, 317, 330, 637, 738, 943, 197, 338, 420, 799],
+            999: [795, 196, 43, 507, 867, 1, 163, 106, 167, 531],
+        },
+        (HalfGreedyGossipStrategy, 50): {
+            0: [26, 43, 1, 18, 44, 28, 30, 4, 19, 36],
+            1: [18, 44, 0, 26, 43, 35, 29, 22, 34, 25],
+            25: [8, 42, 5, 22, 39, 24, 14, 17, 1, 19],
+            49: [6, 32, 16, 33, 13, 0, 43, 14, 24, 11],
+        },
+        (HalfGreedyGossipStrategy, 1000): {
+            0: [26, 43, 60, 86, 103, 870, 400, 782, 917, 436],
+            1: [18, 44, 61, 78, 104, 43, 271, 994, 529, 503],
+            500: [20, 37, 54, 80, 97, 73, 861, 263, 287, 912],
+            999: [5, 22, 39, 65, 82, 947, 202, 343, 425, 803],
+        },
+    }
+    for (strategy, node_count), expected in baseline.items():
+        nodes = [Node(lat.locations[i * 7 % len(lat.locations)], i, strategy(10)) for i in range(node_count)]
+        network = Network(nodes, lat)
+        random.seed(0)
+        network.initialize()
+        for node_id, neighbors in expected.items():
+            actual = nodes[node_id].strategy.neighbors.tolist()
+            assert actual == neighbors, f"{strategy.__name__} with {node_count} nodes, node {node_id}: {actual} != {neighbors}"
+    print("Seeded neighbor lists match the baseline!")
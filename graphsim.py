@@ -1,79 +1,32 @@
 import networkx as nx
-from itertools import combinations
+from itertools import combinations, islice
+from functools import lru_cache
+from multiprocessing import Pool
+import argparse
+import csv
+import hashlib
 import math
+import os
 import random
 import numpy as np
+from reachability import reachable_counts
+from topology import Topology
+from circulant import CirculantGraph
+from numtheory import coprimes_below, select_geometric_series
 
 def get_coprimes(n):
     # require n to be larger than 5
     n = int(n)
     if n <= 5:
         raise ValueError("n must be larger than 5")
-    
-    def gcd(a, b):
-        while b:
-            a, b = b, a % b
-        return a
-    
-    coprimes = [1]
-    for num in range(2, n//2):
-        if gcd(num, n) == 1:
-            coprimes.append(num)
-
-    return coprimes
-
-def select_geometric_series(values, k):
-    if k == 1:
-        return [values[0]]
-    
-    if k > len(values):
-        raise ValueError(f"k is larger than the number of values: {k} > {len(values)}")
-    
-    max_val = values[-1]
-    
-    # Generate a target geometric series
-    base = max_val ** (1 / (k - 1))
-    targets = [(base ** i) for i in range(k)]
-
-    # print(f"Base: {base}")
-    # print(f"Targets: {targets}")
-    
-    # Select closest values from the list
-    selected_values = []
-    remaining_values = values[:]
-    for target in targets:
-        # Find the closest value in the remaining list
-        closest = min(remaining_values, key=lambda v: abs(v - target))
-        selected_values.append(closest)
-        remaining_values.remove(closest)  # Avoid duplicates
-    
-    # print(f"Selected values: {selected_values}")
-    return selected_values
-
-def reservoir_sampling_combinations(iterable, k):
-    # Initialize the reservoir with the first k combinations
-    reservoir = []
-    for idx, combination in enumerate(iterable):
-        if idx < k:
-            reservoir.append(combination)
-        else:
-            # Generate a random index to potentially replace in the reservoir
-            j = random.randint(0, idx)
-            if j < k:
-                reservoir[j] = combination
 
-    return reservoir
+    return coprimes_below(n, n // 2)
 
 def hamiltonian_graph(n, k):
-    G = nx.DiGraph()
+    # One Hamiltonian path 0, c, 2c, ... per stride, kept implicit
     cp = get_coprimes(n)
     cycles = select_geometric_series(cp, math.ceil(k))
-    for c in cycles:
-        for i in range(n-1):
-            s = i*c % n
-            t = (i + 1)*c % n
-            G.add_edge(s, t)
-    return G
+    return CirculantGraph(n, cycles, closed=False)
 
 def random_graph(n, k):
     G = nx.DiGraph()
@@ -86,70 +39,268 @@ def random_graph(n, k):
     return G
 
 def tree_graph(n, k):
-    G = nx.DiGraph()
     total_messages = n * k
     fanout = math.ceil(math.sqrt(total_messages))
-    print(f"Fanout: {fanout}")
+    # print(f"Fanout: {fanout}")
     cycles = get_coprimes(n)
     if len(cycles) > k:
         cycles = select_geometric_series(cycles, k)
     elif len(cycles) < k:
         cycles = random.choices(cycles, k=k)
 
-    for c in cycles:
-        for i in range(math.ceil(fanout/k)):
-            target = ((i * fanout + 1) * c) % n
-            G.add_edge(0, target)
-            for j in range(1, fanout):
-                secondary = ((i * fanout + j + 1) * c) % n
-                G.add_edge(target, secondary)
+    # Node 0 sends to every (i * fanout + 1) * c, which forwards to the next
+    # fanout - 1 multiples of c. All edges are generated at once as arrays.
+    c = np.array(cycles, dtype=np.int64)[:, None, None]
+    i = np.arange(math.ceil(fanout/k), dtype=np.int64)[None, :, None]
+    j = np.arange(fanout, dtype=np.int64)[None, None, :]
+    positions = ((i * fanout + j + 1) * c) % n
+    targets = positions[:, :, :1]
+    secondaries = positions[:, :, 1:]
+
+    src = np.concatenate([np.zeros(targets.size, dtype=np.int64),
+                          np.broadcast_to(targets, secondaries.shape).ravel()])
+    dst = np.concatenate([targets.ravel(), secondaries.ravel()])
+    return Topology.from_edges(src, dst, n)
+
+GRAPH_TYPES = {
+    "hamiltonian": hamiltonian_graph,
+    "random": random_graph,
+    "tree": tree_graph,
+}
+
+RESULT_COLUMNS = ["graph_type", "n", "amp", "success_rate", "failure_ratio"]
+# A chunk is identified by the first seven columns; its failure sets depend on
+# chunk_size and sample_size, so those are part of it
+CHUNK_COLUMNS = ["graph_type", "n", "amp", "seed", "chunk", "chunk_size", "sample_size",
+                 "total_count", "success_count", "failure_ratio_sum", "failure_count"]
+CHUNK_KEY = CHUNK_COLUMNS[:7]
+
+@lru_cache(maxsize=4)
+def build_graph(graph_type, n, amp, seed):
+    # Graphs are rebuilt in each worker from their parameters instead of being
+    # pickled, so the random graph types have to be seeded from them too
+    random.seed(f"graph-{graph_type}-{n}-{amp}-{seed}")
+    G = GRAPH_TYPES[graph_type](n, amp)
+    if isinstance(G, nx.Graph):
+        G = Topology.from_networkx(G, n)
     return G
 
-print("graph_type,n,amp,success_rate,failure_ratio")
-
-for n in [31, 101, 301, 1001, 3001, 10001]:
-    for amp in [1]:#2, 4, 8, 12]:
-        for graph_type, graph_fn in [
-            # ("hamiltonian", hamiltonian_graph),
-            # ("random", random_graph), 
-            ("tree", tree_graph)
-        ]:
-            G = graph_fn(n, amp)
-
-            node_degree = [d for n, d in G.degree()]
-            # print(f"Degree range: {min(node_degree)} - {max(node_degree)}")
-            # print(f"Edges: {G.number_of_edges()}")
-            # print(f"Eccentricity: {nx.eccentricity(G, v=0)}")
-            
-            testing_combos = []
-            combo_count = math.comb(n, n // 3)
-            sample_size = 10000
-
-            if combo_count < sample_size:
-                testing_combos = combinations(range(1, n), n // 3)
-            elif combo_count < sample_size * 10:
-                testing_combos = reservoir_sampling_combinations(combinations(range(1, n), n // 3), sample_size)
-            else:
-                random_set = set()
-                while len(random_set) < sample_size:
-                    candidate = random.sample(range(1, n), n // 3)
-                    candidate.sort()
-                    random_set.add(tuple(candidate))
-                testing_combos = list(random_set)
-
-            success_count = 0
-            total_count = 0
-            failure_ratios = []
-
-            for combo in testing_combos:
-                test = G.copy()
-                test.remove_nodes_from(combo)
-                total_count += 1
-                desc = nx.descendants(test, 0)
-                if len(desc) == n - len(combo) - 1:
-                    success_count += 1
-                else:
-                    failure_ratios.append(len(desc) / (n - len(combo)))
-
-            success_rate = success_count / total_count
-            print(f"{graph_type},{n},{amp},{success_rate},{len(failure_ratios) and np.mean(failure_ratios) or "nan"}", flush=True)
+def unrank_combination(index, items, k):
+    # The index-th k-combination of items in lexicographic order
+    result = []
+    start = 0
+    for remaining in range(k, 0, -1):
+        for i in range(start, len(items)):
+            count = math.comb(len(items) - i - 1, remaining - 1)
+            if index < count:
+                result.append(items[i])
+                start = i + 1
+                break
+            index -= count
+    return tuple(result)
+
+def failure_set_count(n, sample_size):
+    # Sets of n // 3 nodes other than node 0 in a sweep point's sample
+    return min(sample_size, math.comb(n - 1, n // 3))
+
+class FailureSetStream:
+    # Random failure sets of n // 3 nodes other than node 0, each drawn from its
+    # own generator seeded with its index, so any set can be redrawn on its own.
+    # A sweep's sample is the first sample_size distinct sets of the stream; only
+    # the indices of the sets kept so far and 8-byte digests of them are held,
+    # so chunks can run in any order and on any worker without sharing a set.
+    def __init__(self, n, seed):
+        self.n = n
+        self.seed = seed
+        self.k = n // 3
+        self.dtype = np.int16 if n < 2**15 else np.int32
+        self.kept = []
+        self.digests = set()
+        self.next_index = 0
+
+    def draw(self, index):
+        rng = np.random.default_rng([self.n, self.seed, index])
+        return (np.sort(rng.choice(self.n - 1, self.k, replace=False)) + 1).astype(self.dtype)
+
+    def sets(self, start, stop):
+        while len(self.kept) < stop:
+            digest = hashlib.blake2b(self.draw(self.next_index).tobytes(), digest_size=8).digest()
+            if digest not in self.digests:
+                self.digests.add(digest)
+                self.kept.append(self.next_index)
+            self.next_index += 1
+        return [self.draw(index) for index in self.kept[start:stop]]
+
+@lru_cache(maxsize=2)
+def failure_set_stream(n, seed):
+    return FailureSetStream(n, seed)
+
+def sample_failure_sets(n, sample_size, seed, chunk, chunk_size):
+    # Failure sets [chunk * chunk_size, (chunk + 1) * chunk_size) of the sweep's
+    # sample, each a set of n // 3 nodes other than node 0. Chunks can run in any
+    # order and on any worker and always get the same sets.
+    k = n // 3
+    start = chunk * chunk_size
+    stop = min(start + chunk_size, failure_set_count(n, sample_size))
+    combo_count = math.comb(n, k)
+
+    if combo_count < sample_size:
+        # Few enough to test every combination
+        return list(islice(combinations(range(1, n), k), start, stop))
+    elif combo_count < sample_size * 10:
+        # Sample distinct combinations by index, at most all of them
+        population = math.comb(n - 1, k)
+        indices = random.Random(f"combos-{n}-{seed}").sample(range(population), min(sample_size, population))
+        return [unrank_combination(i, range(1, n), k) for i in indices[start:stop]]
+    else:
+        return failure_set_stream(n, seed).sets(start, stop)
+
+def run_chunk(task):
+    graph_type, n, amp, seed, chunk, chunk_size, sample_size = task
+    graph = build_graph(graph_type, n, amp, seed)
+    testing_combos = sample_failure_sets(n, sample_size, seed, chunk, chunk_size)
+    reachable = reachable_counts(graph, 0, testing_combos)
+
+    success_count = 0
+    failure_ratios = []
+    for combo, desc_count in zip(testing_combos, reachable):
+        if desc_count == n - len(combo) - 1:
+            success_count += 1
+        else:
+            failure_ratios.append(desc_count / (n - len(combo)))
+
+    return [graph_type, n, amp, seed, chunk, chunk_size, sample_size,
+            len(testing_combos), success_count, float(sum(failure_ratios)), len(failure_ratios)]
+
+def completed_chunks(path):
+    if not os.path.exists(path):
+        return set()
+
+    # Drop a partially written last row left behind by an interrupted sweep
+    with open(path, "rb+") as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+
+    with open(path, newline="") as f:
+        reader = csv.DictReader(f)
+        if reader.fieldnames is not None and reader.fieldnames != CHUNK_COLUMNS:
+            raise ValueError(f"{path} has different columns than this version writes, use a new results file")
+        return {tuple(row[column] for column in CHUNK_KEY) for row in reader}
+
+def sweep_points(ns, amps, graph_types):
+    return [(graph_type, n, amp) for n in ns for amp in amps for graph_type in graph_types]
+
+def run_sweep(path, ns, amps, graph_types, sample_size=10000, chunk_size=640, seed=0, processes=None):
+    # Split every sweep point into chunks of failure sets and append each chunk's
+    # totals to the results file as it finishes. Chunks already in the file are
+    # skipped, so an interrupted sweep resumes where it stopped.
+    done = completed_chunks(path)
+
+    # Chunks of a different chunk_size or sample_size cover different failure
+    # sets, so they can't be mixed into the same sweep point
+    points = {(graph_type, str(n), str(amp), str(seed)) for graph_type, n, amp in sweep_points(ns, amps, graph_types)}
+    sizes = (str(chunk_size), str(sample_size))
+    for key in done:
+        if key[:4] in points and key[5:] != sizes:
+            raise ValueError(f"{path} has chunks of {key[:4]} with chunk_size, sample_size = {key[5:]}, "
+                             f"not {sizes}; use a new results file or the same sizes")
+
+    tasks = []
+    for graph_type, n, amp in sweep_points(ns, amps, graph_types):
+        chunk_count = math.ceil(failure_set_count(n, sample_size) / chunk_size)
+        for chunk in range(chunk_count):
+            task = (graph_type, n, amp, seed, chunk, chunk_size, sample_size)
+            if tuple(str(v) for v in task) not in done:
+                tasks.append(task)
+
+    write_header = not os.path.exists(path) or os.path.getsize(path) == 0
+    with open(path, "a", newline="") as f:
+        writer = csv.writer(f)
+        if write_header:
+            writer.writerow(CHUNK_COLUMNS)
+
+        with Pool(processes) as pool:
+            for row in pool.imap_unordered(run_chunk, tasks):
+                writer.writerow(row)
+                f.flush()
+
+    return summarize_sweep(path, ns, amps, graph_types, seed)
+
+def summarize_sweep(path, ns, amps, graph_types, seed=0):
+    totals = {}
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            if row["seed"] != str(seed):
+                continue
+            key = (row["graph_type"], int(row["n"]), float(row["amp"]))
+            total = totals.setdefault(key, [0, 0, 0.0, 0])
+            total[0] += int(row["total_count"])
+            total[1] += int(row["success_count"])
+            total[2] += float(row["failure_ratio_sum"])
+            total[3] += int(row["failure_count"])
+
+    results = []
+    for graph_type, n, amp in sweep_points(ns, amps, graph_types):
+        total_count, success_count, failure_ratio_sum, failure_count = totals.get((graph_type, n, float(amp)), [0, 0, 0.0, 0])
+        if total_count == 0:
+            continue
+        success_rate = success_count / total_count
+        failure_ratio = failure_count and failure_ratio_sum / failure_count or "nan"
+        results.append([graph_type, n, amp, success_rate, failure_ratio])
+    return results
+
+def test_sample_failure_sets():
+    def sample(n, sample_size, seed=0, chunk_size=64):
+        chunk_count = math.ceil(failure_set_count(n, sample_size) / chunk_size)
+        return [tuple(int(node) for node in failure_set)
+                for chunk in range(chunk_count)
+                for failure_set in sample_failure_sets(n, sample_size, seed, chunk, chunk_size)]
+
+    # n = 12 has comb(12, 4) = 495 sets of 4 nodes, 330 of them without node 0.
+    # Samples between the two take every one of the 330 instead of failing.
+    everything = set(combinations(range(1, 12), 4))
+    for sample_size in [329, 330, 331, 400, 495, 496, 1000]:
+        sets = sample(12, sample_size)
+        assert len(sets) == failure_set_count(12, sample_size) == min(sample_size, 330), sample_size
+        assert len(set(sets)) == len(sets) and set(sets) <= everything, sample_size
+
+    # Random sets are distinct across chunks even where the stream repeats some
+    # (comb(20, 7) = 77520), and a chunk gets the same sets wherever it runs
+    for n in [21, 301]:
+        sets = sample(n, 10000, chunk_size=640)
+        assert len(sets) == len(set(sets)) == 10000, n
+        assert all(len(failure_set) == n // 3 and 0 not in failure_set and list(failure_set) == sorted(failure_set)
+                   for failure_set in sets), n
+        failure_set_stream.cache_clear()
+        last_chunk = [tuple(int(node) for node in failure_set) for failure_set in sample_failure_sets(n, 10000, 0, 15, 640)]
+        assert last_chunk == sets[15 * 640:], n
+        assert sample(n, 1000, seed=1) != sets[:1000], n
+
+    print("Failure set samples are distinct and complete!")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resilience sweep over failure sets of n // 3 nodes")
+    parser.add_argument("results", nargs="?", help="Append-only file of per-chunk results (resumed if it exists)")
+    parser.add_argument("--ns", nargs="+", type=int, default=[31, 101, 301, 1001, 3001, 10001])
+    parser.add_argument("--amps", nargs="+", type=int, default=[1])
+    parser.add_argument("--graph-types", nargs="+", choices=GRAPH_TYPES, default=["tree"])
+    parser.add_argument("--sample-size", type=int, default=10000)
+    parser.add_argument("--chunk-size", type=int, default=640)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--self-test", action="store_true", help="Check the failure set samplers and exit")
+    args = parser.parse_args()
+
+    if args.self_test:
+        test_sample_failure_sets()
+        raise SystemExit
+    if args.results is None:
+        parser.error("the results file is required")
+
+    results = run_sweep(args.results, args.ns, args.amps, args.graph_types,
+                        args.sample_size, args.chunk_size, args.seed, args.processes)
+
+    print(",".join(RESULT_COLUMNS))
+    for row in results:
+        print(",".join(str(v) for v in row), flush=True)
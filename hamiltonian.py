@@ -1,65 +1,86 @@
 
+from typing import NamedTuple
+from functools import lru_cache
 from strategy import Strategy
+from numtheory import coprime_mask
 import random
 import math
+import numpy as np
 
 big_prime1 = 0x7FFFFFFF
 big_prime2 = 87178291199
 
+class StridePlan(NamedTuple):
+    # strides: one per Hamiltonian cycle; offsets: +stride for each cycle, then
+    # -stride for each, in forward list order
+    strides: tuple
+    offsets: np.ndarray
+
+@lru_cache(maxsize=64)
+def stride_plan(node_count, degree):
+    # Strides of the ceil(degree / 2) Hamiltonian cycles every node sits on. They
+    # only depend on the network size and degree, so they're worked out once and
+    # shared by every node (and by strategies that compute neighbors on the fly).
+    hamiltonian_count = math.ceil(degree / 2)
+    max_stride = node_count // 2
+    cp1 = big_prime1 % max_stride
+    cp2 = big_prime2 % max_stride
+
+    if abs(cp1 - (max_stride//2)) < abs(cp2 - (max_stride//2)):
+        stride_stride = cp1
+    else:
+        stride_stride = cp2
+
+    # Candidate strides are i * stride_stride % max_stride for i = 1, 2, ... Take
+    # the first ones coprime to n (one Hamiltonian cycle each), and fall back to
+    # ones with gcd 2 if we run out of numbers less than n/2. (Values above n/2
+    # are equivalent to values below n/2, just in the other direction.) gcd(x, n)
+    # is 2 exactly when n and x are even and gcd(x / 2, n / 2) is 1.
+    coprime_to_n = coprime_mask(node_count)
+    coprime_to_half = coprime_mask(node_count // 2)
+    cycle_strides = []
+    backup_strides = []
+    chunk_size = max(64, 4 * hamiltonian_count)
+    for start in range(1, max_stride, chunk_size):
+        i = np.arange(start, min(start + chunk_size, max_stride), dtype=np.int64)
+        candidates = i * stride_stride % max_stride
+        coprime = coprime_to_n[candidates]
+        if node_count % 2 == 0:
+            gcd_two = (candidates % 2 == 0) & coprime_to_half[candidates // 2]
+        else:
+            gcd_two = np.zeros(len(candidates), dtype=bool)
+
+        # Stop at the candidate that completes the set of cycle strides
+        found = np.flatnonzero(coprime)[:hamiltonian_count - len(cycle_strides)]
+        stop = found[-1] + 1 if len(cycle_strides) + len(found) == hamiltonian_count else len(candidates)
+        cycle_strides.extend(candidates[found].tolist())
+        backup_strides.extend(candidates[:stop][gcd_two[:stop]].tolist())
+        if len(cycle_strides) == hamiltonian_count:
+            break
+
+    if len(cycle_strides) < hamiltonian_count:
+        cycle_strides.extend(backup_strides[:hamiltonian_count - len(cycle_strides)])
+
+    strides = np.array(cycle_strides, dtype=np.int64)
+    offsets = np.concatenate([strides, node_count - strides])
+    offsets.setflags(write=False)
+    return StridePlan(tuple(cycle_strides), offsets)
+
 class HamiltonionStrategy(Strategy):
     def __init__(self, degree=4):
         super().__init__()
         self.degree = degree
-        self.neighbors = []
-
-    def set_network(self, network, node_id):
-        super().set_network(network, node_id)
-
-        def gcd(a, b):
-            """Calculate the Greatest Common Divisor of a and b using Euclidean algorithm."""
-            while b:
-                a, b = b, a % b
-            return a
-        
-        hamiltonian_count = math.ceil(self.degree / 2)
+
+    def select_neighbors(self):
         node_count = len(self.network.node_list)
-        cycle_strides = []
-        backup_strides = []
-        i = 1
-        max_stride = node_count // 2
-        cp1 = big_prime1 % max_stride
-        cp2 = big_prime2 % max_stride
-
-        if abs(cp1 - (max_stride//2)) < abs(cp2 - (max_stride//2)):
-            stride_stride = cp1
-        else:
-            stride_stride = cp2
-
-        # Add stride lengths until we have enough to reach our target degree, or run
-        # out of numbers less than n/2. (Values above n/2 are equivalent to values
-        # below n/2, just in the other direction.)
-        while len(cycle_strides) < hamiltonian_count and i < max_stride:
-            possible_stride = (i * stride_stride) % max_stride
-            gcd_result = gcd(possible_stride, node_count)
-            if gcd_result == 1:
-                cycle_strides.append(possible_stride)
-            elif gcd_result == 2:
-                backup_strides.append(possible_stride)
-            i += 1
-        
-        if len(cycle_strides) < hamiltonian_count:
-            cycle_strides.extend(backup_strides[:hamiltonian_count - len(cycle_strides)])
-
-        # In the real code, we wouldn't recompute the neighbors here, we would just
-        # use cycle_strides to compute the neighbors in the forward list.
-        self.neighbors = [self.network.node_list[(self.node.id + stride) % node_count] for stride in cycle_strides]
-        self.neighbors.extend([self.network.node_list[(self.node.id + node_count - stride) % node_count] for stride in cycle_strides])
+        return ((self.node.id + stride_plan(node_count, self.degree).offsets) % node_count).tolist()
 
     def get_forward_list(self, sender, codeword_id):
+        neighbors = self.neighbors
         if sender is None:
-            return self.neighbors
+            return neighbors
         else:
-            return [n for n in self.neighbors if n != sender]
+            return neighbors[neighbors != sender.id]
 
 if __name__ == "__main__":
     from network import Network
@@ -72,10 +93,11 @@ if __name__ == "__main__":
 
     def print_neighbors(network):
         for node in network.node_list:
-            print(f"{node.id} - {node.location} neighbors:", [n.id for n in node.strategy.neighbors], end=" ")
-            print(f"Latencies: {[lat.get_latency(node.location, n.location) for n in node.strategy.neighbors]}")
-            assert len(node.strategy.neighbors) == 6, "Should have exactly 3 neighbors"
-            assert node not in node.strategy.neighbors, "Node shouldn't be its own neighbor"
+            neighbors = [network.node_list[i] for i in node.strategy.neighbors]
+            print(f"{node.id} - {node.location} neighbors:", [n.id for n in neighbors], end=" ")
+            print(f"Latencies: {[lat.get_latency(node.location, n.location) for n in neighbors]}")
+            assert len(neighbors) == 6, "Should have exactly 3 neighbors"
+            assert node not in neighbors, "Node shouldn't be its own neighbor"
 
     hamiltonianNodes = [Node(locations[i], i, HamiltonionStrategy(6)) for i in range(20)]
     hamiltonianNetwork = Network(hamiltonianNodes, lat)
@@ -0,0 +1,78 @@
+import heapq
+import math
+
+
+class HeapQueue:
+    # Binary heap of (arrival time, sequence, item). The sequence number keeps
+    # items with the same arrival time in the order they were pushed.
+    def __init__(self):
+        self.heap = []
+        self.sequence = 0
+
+    def push(self, time, item):
+        heapq.heappush(self.heap, (time, self.sequence, item))
+        self.sequence += 1
+
+    def next_time(self):
+        return self.heap[0][0]
+
+    def pop(self):
+        time, _, item = heapq.heappop(self.heap)
+        return time, item
+
+    def __len__(self):
+        return len(self.heap)
+
+
+class CalendarQueue:
+    # Calendar (bucket) queue keyed by the integer tick an item is picked up on,
+    # i.e. ceil(arrival time). Each bucket is a plain list, so pushes are O(1)
+    # appends and only the distinct bucket ticks go through a heap. Items must not
+    # be pushed with a time earlier than an item that has already been popped.
+    def __init__(self):
+        self.buckets = {}
+        self.ticks = []
+        self.head = []
+        self.head_tick = None
+        self.head_index = 0
+        self.count = 0
+
+    def push(self, time, item):
+        tick = math.ceil(time)
+        if self.head_index < len(self.head) and tick <= self.head_tick:
+            # The open bucket was only peeked at and this item belongs at or before
+            # it, so put what is left of it back on the calendar.
+            self.buckets[self.head_tick] = self.head[self.head_index:]
+            heapq.heappush(self.ticks, self.head_tick)
+            self.head = []
+            self.head_index = 0
+
+        bucket = self.buckets.get(tick)
+        if bucket is None:
+            bucket = self.buckets[tick] = []
+            heapq.heappush(self.ticks, tick)
+        bucket.append((time, item))
+        self.count += 1
+
+    def _load_head(self):
+        # Open the next bucket. Fractional arrival times can share a bucket, so
+        # sort it by time; the sort is stable, which keeps equal times FIFO.
+        while self.head_index >= len(self.head):
+            self.head_tick = heapq.heappop(self.ticks)
+            self.head = self.buckets.pop(self.head_tick)
+            self.head.sort(key=lambda entry: entry[0])
+            self.head_index = 0
+
+    def next_time(self):
+        self._load_head()
+        return self.head[self.head_index][0]
+
+    def pop(self):
+        self._load_head()
+        entry = self.head[self.head_index]
+        self.head_index += 1
+        self.count -= 1
+        return entry
+
+    def __len__(self):
+        return self.count
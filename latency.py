@@ -1,3 +1,6 @@
+import numpy as np
+
+
 class LatencyModel:
     def __init__(self, latency_data,
             provider_list=[],
@@ -14,15 +17,26 @@ class LatencyModel:
         self.latency_data = latency_data
         self.has_providers = (len(provider_list) > 0)
 
-        cities = latency_data.keys()
+        cities = list(latency_data.keys())
 
+        # Each location is a (city, provider) pair, kept as parallel index lists so
+        # the matrices below can be built without parsing the location strings.
         if self.has_providers:
             self.locations = []
-            for city in cities:
-                for provider in provider_list:
+            location_cities = []
+            location_providers = []
+            for city_id, city in enumerate(cities):
+                for provider_id, provider in enumerate(provider_list):
                     self.locations.append(f"{city} ({provider})")
+                    location_cities.append(city_id)
+                    location_providers.append(provider_id)
         else:
             self.locations = list(cities)
+            location_cities = list(range(len(cities)))
+            location_providers = [0] * len(cities)
+
+        # Intern every location to an integer index
+        self.location_ids = {location: i for i, location in enumerate(self.locations)}
 
         self.cross_provider_latency_multiplier = cross_provider_latency_multiplier
         self.cross_provider_loss_multiplier = cross_provider_loss_multiplier
@@ -38,58 +52,67 @@ class LatencyModel:
             self.min_loss = min_loss
             self.max_loss = max_loss
 
-    def get_latency(self, locA, locB):
-        if not self.has_providers:
-            return self.latency_data[locA][locB]
+        # Dense location x location matrices with the provider multipliers applied
+        city_latency = np.array([[latency_data[a][b] for b in cities] for a in cities], dtype=np.float64)
+        base_latency = city_latency[np.ix_(location_cities, location_cities)]
+        location_providers = np.array(location_providers)
+        cross_provider = location_providers[:, None] != location_providers[None, :]
+
+        # The float32 matrices are the compact views handed out; scalar lookups and
+        # exact=True read the float64 values, which are the ones ticks are
+        # computed from
+        self.latency_exact = np.where(cross_provider, base_latency * cross_provider_latency_multiplier, base_latency)
+        self.latency_exact.setflags(write=False)
+        self.latency = self.latency_exact.astype(np.float32)
+        self.latency.setflags(write=False)
+
+        if self.has_loss:
+            base_loss = self.min_loss + (self.max_loss - self.min_loss) * (base_latency / self.max_latency)
+            loss = np.where(cross_provider, base_loss * cross_provider_loss_multiplier, base_loss)
         else:
-            # Extract city and provider names
-            partsA = locA.split(" (")
-            cityA = partsA[0]
-            provA = partsA[1].rstrip(")")
-
-            partsB = locB.split(" (")
-            cityB = partsB[0]
-            provB = partsB[1].rstrip(")")
-            
-            # Get base latency
-            base_latency = self.latency_data[cityA][cityB]
-            
-            # Apply latency factor if providers differ
-            if provA != provB:
-                return base_latency * self.cross_provider_latency_multiplier
-            else:
-                return base_latency
+            loss = np.zeros_like(base_latency)
+        self.loss = loss.astype(np.float32)
+        self.loss.setflags(write=False)
 
-    def get_loss_ratio(self, locA, locB):
-        if not self.has_loss:
-            return 0
+        # Plain nested lists for scalar lookups, which are faster than indexing numpy
+        self.latency_rows = self.latency_exact.tolist()
+        self.loss_rows = loss.tolist()
 
-        if not self.has_providers:
-            latency = self.get_latency(locA, locB)
+        # Latency submatrices, cached per distinct set of locations
+        self.submatrices = {}
 
-            # assume that the packet loss ratio increases with latency
-            return self.min_loss + \
-                (self.max_loss - self.min_loss) * (latency / self.max_latency)
-        else:
-            # Extract city and provider names
-            partsA = locA.split(" (")
-            cityA = partsA[0]
-            provA = partsA[1].rstrip(")")
+    def location_id(self, location):
+        return self.location_ids[location]
+
+    def latency_matrix(self, exact=False):
+        return self.latency_exact if exact else self.latency
+
+    def loss_matrix(self):
+        return self.loss
 
-            partsB = locB.split(" (")
-            cityB = partsB[0]
-            provB = partsB[1].rstrip(")")
-            
-            # Get base latency
-            base_latency = self.latency_data[cityA][cityB]
-            base_loss = self.min_loss + \
-                (self.max_loss - self.min_loss) * (base_latency / self.max_latency)
+    def latency_submatrix(self, location_ids):
+        location_ids = np.asarray(location_ids, dtype=np.int64)
+        key = location_ids.tobytes()
+        if key not in self.submatrices:
+            submatrix = self.latency[np.ix_(location_ids, location_ids)]
+            submatrix.setflags(write=False)
+            self.submatrices[key] = submatrix
+        return self.submatrices[key]
 
-            # Apply loss factor if providers differ
-            if provA != provB:
-                return base_loss * self.cross_provider_loss_multiplier
-            else:
-                return base_loss
+    def latencies_from(self, location_id):
+        return self.latency[location_id]
+
+    def get_latency_by_id(self, idA, idB):
+        return self.latency_rows[idA][idB]
+
+    def get_loss_ratio_by_id(self, idA, idB):
+        return self.loss_rows[idA][idB]
+
+    def get_latency(self, locA, locB):
+        return self.latency_rows[self.location_ids[locA]][self.location_ids[locB]]
+
+    def get_loss_ratio(self, locA, locB):
+        return self.loss_rows[self.location_ids[locA]][self.location_ids[locB]]
 
 
 
@@ -110,6 +133,25 @@ def test_latency_model():
     assert model_with_providers.get_latency("Tokyo (MSA)", "Singapore (MSA)") == 30
     assert model_with_providers.get_latency("Tokyo (MSA)", "Singapore (AWS)") == 45
 
+    # Test the interned location ids and matrices
+    ny_aws = model_with_providers.location_id("NewYork (AWS)")
+    london_gcp = model_with_providers.location_id("London (GCP)")
+    assert model_with_providers.locations[ny_aws] == "NewYork (AWS)"
+    assert model_with_providers.get_latency_by_id(ny_aws, london_gcp) == 52.5
+    assert model_with_providers.latency_matrix()[ny_aws, london_gcp] == 52.5
+    assert model_with_providers.latencies_from(ny_aws)[london_gcp] == 52.5
+    assert model_with_providers.latency_matrix().dtype == np.float32
+
+    # Scalar lookups keep full precision: 10 * 1.1 is just above 11, which
+    # float32 would round down to 11 and so deliver a tick early
+    model_with_multiplier = LatencyModel({"A": {"A": 0, "B": 10}, "B": {"A": 10, "B": 0}},
+                                         provider_list=["AWS", "GCP"], cross_provider_latency_multiplier=1.1)
+    assert model_with_multiplier.get_latency("A (AWS)", "B (GCP)") == 10 * 1.1
+    a_aws = model_with_multiplier.location_id("A (AWS)")
+    b_gcp = model_with_multiplier.location_id("B (GCP)")
+    assert model_with_multiplier.get_latency_by_id(a_aws, b_gcp) == 10 * 1.1
+    assert model_with_multiplier.latency_matrix(exact=True)[a_aws, b_gcp] == 10 * 1.1
+
     # Test with small custom latency data
     small_latency_data = {
         "A": {"A": 0, "B": 10, "C": 20},
@@ -135,6 +177,9 @@ def test_latency_model():
     
     assert abs(loss_model_with_providers.get_loss_ratio("A (AWS)", "B (AWS)") - 0.03) < 0.001
     assert abs(loss_model_with_providers.get_loss_ratio("A (AWS)", "B (GCP)") - 0.045) < 0.001
+    a_aws = loss_model_with_providers.location_id("A (AWS)")
+    b_gcp = loss_model_with_providers.location_id("B (GCP)")
+    assert abs(loss_model_with_providers.loss_matrix()[a_aws, b_gcp] - 0.045) < 0.001
 
     print("All latency model tests passed!")
 
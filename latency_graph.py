@@ -0,0 +1,186 @@
+import heapq
+import numpy as np
+from scipy.sparse import csr_matrix
+
+# Latency between every pair of nodes, without materializing the pairs. Nodes only
+# ever sit at one of a few dozen locations, so everything is computed from the
+# location x location submatrix plus the location of each node. Dense matrices,
+# sparse graphs and networkx graphs are only built when asked for.
+
+class LatencyGraph:
+    def __init__(self, latency_model, location_ids):
+        self.latency_model = latency_model
+        self.location_ids = np.asarray(location_ids, dtype=np.int64)
+        self.node_count = len(self.location_ids)
+
+        # Distinct locations in use, and the index of each node's location among them
+        self.locations, self.node_locations = np.unique(self.location_ids, return_inverse=True)
+        self.location_latency = latency_model.latency_submatrix(self.locations)
+        self.groups = None
+
+    def get_groups(self):
+        # Node ids at each location in use, in node order
+        if self.groups is None:
+            order = np.argsort(self.node_locations, kind="stable")
+            starts = np.searchsorted(self.node_locations[order], np.arange(len(self.locations)))
+            self.groups = np.split(order, starts[1:])
+        return self.groups
+
+    def group_sizes(self):
+        return np.bincount(self.node_locations, minlength=len(self.locations))
+
+    def latency(self, a, b):
+        return self.location_latency[self.node_locations[a], self.node_locations[b]]
+
+    def row(self, node_id):
+        return self.location_latency[self.node_locations[node_id]][self.node_locations]
+
+    def rows(self, node_ids):
+        return self.location_latency[np.ix_(self.node_locations[node_ids], self.node_locations)]
+
+    def blocks(self, block_size=1024):
+        # Yield (first node id, rows) blocks of the dense matrix, for analyses that
+        # need every pair but should not hold all n^2 latencies at once
+        for start in range(0, self.node_count, block_size):
+            yield start, self.rows(np.arange(start, min(start + block_size, self.node_count)))
+
+    def dense(self):
+        return self.rows(np.arange(self.node_count))
+
+    def closest_nodes(self, location_id):
+        # Yield node ids in order of latency from location_id, with ties in node
+        # order, the same order as a stable sort of all nodes by latency. Only the
+        # location groups are sorted, so taking the first k nodes costs O(k).
+        groups = self.get_groups()
+        latencies = self.latency_model.latencies_from(location_id)[self.locations]
+        for level in np.unique(latencies):
+            members = [groups[i] for i in np.flatnonzero(latencies == level)]
+            if len(members) == 1:
+                yield from members[0]
+            else:
+                yield from heapq.merge(*members)
+
+    def knn(self, k):
+        # Sparse graph from every node to its k closest other nodes
+        rows = []
+        for location_index, members in enumerate(self.get_groups()):
+            if len(members) == 0:
+                continue
+            location_id = self.locations[location_index]
+            closest = []
+            for candidate in self.closest_nodes(location_id):
+                closest.append(candidate)
+                if len(closest) == k + 1:
+                    break
+            closest = np.array(closest, dtype=np.int64)
+
+            # Each node takes the first k of the shared list that aren't itself
+            targets = np.broadcast_to(closest, (len(members), len(closest)))
+            keep = targets != members[:, None]
+            keep &= np.cumsum(keep, axis=1) <= k
+            rows.append((np.repeat(members, keep.sum(axis=1)), targets[keep]))
+        return self._sparse(rows)
+
+    def threshold(self, max_latency):
+        # Sparse graph with an edge between every pair of distinct nodes whose
+        # latency is at most max_latency
+        groups = self.get_groups()
+        rows = []
+        for location_index, members in enumerate(groups):
+            if len(members) == 0:
+                continue
+            near = np.flatnonzero(self.location_latency[location_index] <= max_latency)
+            if len(near) == 0:
+                continue
+            targets = np.concatenate([groups[i] for i in near])
+            src = np.repeat(members, len(targets))
+            dst = np.tile(targets, len(members))
+            keep = src != dst
+            rows.append((src[keep], dst[keep]))
+        return self._sparse(rows)
+
+    def _sparse(self, rows):
+        if rows:
+            src = np.concatenate([r[0] for r in rows])
+            dst = np.concatenate([r[1] for r in rows])
+        else:
+            src = dst = np.zeros(0, dtype=np.int64)
+        weights = self.location_latency[self.node_locations[src], self.node_locations[dst]]
+        # Explicit zeros (co-located nodes) are kept as stored entries
+        return csr_matrix((weights, (src, dst)), shape=(self.node_count, self.node_count))
+
+    def latency_histogram(self):
+        # Number of ordered pairs of distinct nodes at each latency value, computed
+        # from the location groups without looking at individual pairs
+        sizes = self.group_sizes().astype(np.int64)
+        pair_counts = np.outer(sizes, sizes) - np.diag(sizes)
+        values, inverse = np.unique(self.location_latency, return_inverse=True)
+        counts = np.bincount(inverse.ravel(), weights=pair_counts.ravel(), minlength=len(values))
+        return values, counts.astype(np.int64)
+
+    def mean_latency(self):
+        values, counts = self.latency_histogram()
+        return float((values * counts).sum() / counts.sum())
+
+    def to_networkx(self, k=None, max_latency=None):
+        # Explicit export. With neither k nor max_latency this is the complete graph,
+        # which has n(n-1)/2 edges, so only use it for small networks.
+        import networkx as nx
+
+        graph = nx.Graph()
+        graph.add_nodes_from(range(self.node_count))
+        if k is not None:
+            sparse = self.knn(k).tocoo()
+        elif max_latency is not None:
+            sparse = self.threshold(max_latency).tocoo()
+        else:
+            for i in range(self.node_count):
+                row = self.row(i)
+                graph.add_weighted_edges_from((i, j, float(row[j])) for j in range(i + 1, self.node_count))
+            return graph
+
+        graph.add_weighted_edges_from(zip(sparse.row.tolist(), sparse.col.tolist(), sparse.data.tolist()))
+        return graph
+
+
+if __name__ == "__main__":
+    import random
+    import networkx as nx
+    from latency import LatencyModel
+    from latency_data import latency_data
+
+    lat = LatencyModel(latency_data, provider_list=["AWS", "Azure", "Google"],
+                       cross_provider_latency_multiplier=1.5)
+    locations = [lat.location_id(l) for l in random.choices(lat.locations, k=200)]
+    graph = LatencyGraph(lat, locations)
+
+    dense = graph.dense()
+    expected = np.array([[lat.get_latency_by_id(a, b) for b in locations] for a in locations], dtype=np.float32)
+    assert np.array_equal(dense, expected)
+
+    # k nearest: same latencies as the k smallest of each row (excluding self)
+    knn = graph.knn(5)
+    for i in range(len(locations)):
+        row = knn.getrow(i)
+        assert row.nnz == 5 and i not in row.indices
+        others = np.delete(dense[i], i)
+        assert np.array_equal(np.sort(row.data), np.sort(others)[:5])
+
+    threshold = graph.threshold(40)
+    assert threshold.nnz == int((dense <= 40).sum() - len(locations))
+
+    # No pair within max_latency gives an empty graph over the same nodes
+    empty = graph.threshold(-1)
+    assert empty.shape == (len(locations), len(locations)) and empty.nnz == 0
+    assert graph.to_networkx(max_latency=-1).number_of_edges() == 0
+
+    values, counts = graph.latency_histogram()
+    assert counts.sum() == len(locations) * (len(locations) - 1)
+    off_diagonal = dense[~np.eye(len(locations), dtype=bool)]
+    assert abs(graph.mean_latency() - off_diagonal.mean()) < 1e-3
+
+    complete = graph.to_networkx()
+    assert complete.number_of_edges() == len(locations) * (len(locations) - 1) // 2
+    assert complete[3][7]["weight"] == dense[3, 7]
+
+    print("All latency graph tests passed!")
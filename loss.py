@@ -0,0 +1,23 @@
+import numpy as np
+
+
+class LossSampler:
+    # Hands out uniform variates from a seeded generator. They are drawn in large
+    # numpy blocks and converted to plain floats once, so a loss check per packet
+    # is just a list index and a comparison.
+    def __init__(self, seed=None, block_size=1 << 16):
+        self.rng = np.random.default_rng(seed)
+        self.block_size = block_size
+        self.block = []
+        self.index = 0
+
+    def next(self):
+        if self.index >= len(self.block):
+            self.block = self.rng.random(self.block_size).tolist()
+            self.index = 0
+        value = self.block[self.index]
+        self.index += 1
+        return value
+
+    def is_lost(self, loss_ratio):
+        return self.next() < loss_ratio
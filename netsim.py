@@ -7,29 +7,42 @@ from hamiltonian import HamiltonionStrategy
 
 import random
 
-def run_simulation(network, start_node_id):
+def run_simulation(network, start_node_id, event_driven=False, verbose=True, message="start"):
+    if network.profiler is not None:
+        network.profiler.start(network)
+
     start_node = network.node_list[start_node_id]
-    start_node.send_start_packet()
+    start_node.send_start_packet(message)
     total_nodes = len(network.node_list)
     completion_time = None
     completed_nodes = 0
 
     while network.is_active():
-        network.tick()
-        completed_nodes = sum(1 for node in network.node_list if node.completed)
+        if event_driven:
+            network.step()
+        else:
+            network.tick()
+        completed_nodes = network.completed_count
         if completion_time is None and completed_nodes == total_nodes:
             completion_time = network.tick_count
 
-        # if network.tick_count % 1000 == 0:
-        #     print(f" {network.tick_count/1000}s: {completed_nodes}/{total_nodes} {len(network.in_flight)}/{network.total_packets}")
+    if network.trace is not None:
+        network.trace.flush()
+    if network.profiler is not None:
+        network.profiler.stop(network)
+
+    if verbose:
+        if completion_time is not None:
+            print(f" Completion time: {completion_time/1000}s")
+        else:
+            print(f" Completed nodes: {completed_nodes}/{total_nodes}")
 
-    if completion_time is not None:
-        print(f" Completion time: {completion_time/1000}s")
-    else:
-        print(f" Completed nodes: {completed_nodes}/{total_nodes}")
+        print(f" Total time: {network.tick_count/1000}s")
+        print(f" Total packets: {network.total_packets} ({network.total_packets/total_nodes:.3g}x)")
+        if network.latency_model.has_loss and network.total_packets:
+            print(f" Lost packets: {network.lost_packets} ({network.lost_packets/network.total_packets:.3g})")
 
-    print(f" Total time: {network.tick_count/1000}s")
-    print(f" Total packets: {network.total_packets} ({network.total_packets/total_nodes:.3g}x)")
+    return completion_time
 
 if __name__ == "__main__":
     lat = LatencyModel(latency_data, provider_list=["AWS", "Azure", "Google"],
@@ -43,16 +56,26 @@ if __name__ == "__main__":
     randomNodes = [Node(locations[i], i, RandomGossipStrategy(degree)) for i in range(node_count)]
     randomNetwork = Network(randomNodes, lat)
     randomNetwork.initialize()
-    run_simulation(randomNetwork, 0)
+    run_simulation(randomNetwork, 0, event_driven=True)
 
     print("Half")
     halfNodes = [Node(locations[i], i, HalfGreedyGossipStrategy(degree)) for i in range(node_count)]
     halfNetwork = Network(halfNodes, lat)
     halfNetwork.initialize()
-    run_simulation(halfNetwork, 0)
+    run_simulation(halfNetwork, 0, event_driven=True)
 
     print("Hamiltonion")
     hamiltonianNodes = [Node(locations[i], i, HamiltonionStrategy(degree)) for i in range(node_count)]
     hamiltonianNetwork = Network(hamiltonianNodes, lat)
     hamiltonianNetwork.initialize()
-    run_simulation(hamiltonianNetwork, 0)
+    run_simulation(hamiltonianNetwork, 0, event_driven=True)
+
+    # A packet handed straight to a node is processed like a delivered one
+    from packet import Packet
+    injectedNodes = [Node(locations[i], i, RandomGossipStrategy(degree)) for i in range(node_count)]
+    injectedNetwork = Network(injectedNodes, lat)
+    injectedNetwork.initialize()
+    injectedNodes[1].receive_packet(Packet(injectedNodes[0], injectedNodes[1], "start"))
+    while injectedNetwork.is_active():
+        injectedNetwork.step()
+    assert injectedNodes[1].first_packet_tick == 1 and injectedNodes[1].completed
@@ -1,83 +1,134 @@
-import networkx as nx
+import math
+import numpy as np
+from capacity import EgressQueues
+from inflight import HeapQueue
+from latency_graph import LatencyGraph
+from loss import LossSampler
+from topology import TopologyBuilder
+from transmit import Transmitter
 
 
 class Network:
-    def __init__(self, node_list, latency_model):
+    def __init__(self, node_list, latency_model, in_flight=None, seed=None, trace=None, profiler=None,
+                 capacity=None):
         self.node_list = node_list
         self.latency_model = latency_model
+        for node in self.node_list:
+            node.location_id = latency_model.location_id(node.location)
+        self.location_ids = np.array([node.location_id for node in self.node_list], dtype=np.int64)
+        self.node_count = len(node_list)
         self.tick_count = 0
 
+        # Messages are interned so packets can refer to them by index
+        self.messages = []
+        self.message_ids = {}
+
+        self.topology = None
         self.latency_graph = None
-        self.in_flight = []
+        self.in_flight = in_flight if in_flight is not None else HeapQueue()
         self.total_packets = 0
+        self.lost_packets = 0
+
+        # Ids of the nodes with packets in their inbox or sends still pending; only
+        # these are ticked. Counts of queued packets and completed nodes are kept
+        # up to date by the nodes, so nothing has to scan the whole node list.
+        self.active_nodes = set()
+        self.queued_packets = 0
+        self.completed_count = 0
+        self.loss_sampler = LossSampler(seed)
+
+        # Optional capacity.CapacityModel; without one every packet leaves the
+        # moment it is sent
+        self.capacity = capacity
+        self.egress = EgressQueues(capacity, self.node_count) if capacity is not None else None
+
+        # Optional tracing.TraceRecorder that gets every send, drop and delivery
+        self.trace = trace
+        self.transmitter = Transmitter(latency_model, self.location_ids.tolist(), self.in_flight,
+                                       self.loss_sampler, self.egress, trace)
+
+        # Optional profiler.Profiler; it wraps the methods it times, so runs
+        # without one don't pay for any checks
+        self.profiler = profiler
+        if profiler is not None:
+            profiler.attach(self)
 
     def initialize(self):
+        # Let every strategy pick its neighbors, then pack them into one CSR topology
+        builder = TopologyBuilder()
+        for node in self.node_list:
+            node.strategy.set_network(self, node)
+            builder.add(node.strategy.select_neighbors())
+        self.topology = builder.build()
+
         for node in self.node_list:
             node.set_network(self)
 
     def get_latency_graph(self):
-        if self.latency_graph == None:
-            self.latency_graph = nx.Graph()
-            
-            # Add all nodes
-            for node in self.node_list:
-                self.latency_graph.add_node(node.id)
-            
-            # Add edges between all pairs of nodes with latency as weight
-            for i, node1 in enumerate(self.node_list):
-                for node2 in self.node_list[i+1:]:
-                    latency = self.latency_model.get_latency(node1.location, node2.location)
-                    self.latency_graph.add_edge(node1.id, node2.id, weight=latency)
-
+        # Lazy all-pairs latency view; see LatencyGraph for dense, sparse and
+        # networkx exports
+        if self.latency_graph is None:
+            self.latency_graph = LatencyGraph(self.latency_model, self.location_ids)
         return self.latency_graph
 
-    def send(self, packet):
-        packet.source.sent_packet_count += 1
-        self.total_packets += 1
-
-        if self.latency_model.has_loss:
-            loss_ratio = self.latency_model.get_loss_ratio(packet.source.location,
-                packet.destination.location)
-            
-            # TODO: Compute losses
+    def closest_nodes(self, location_id):
+        return self.get_latency_graph().closest_nodes(location_id)
 
-        # Compute the arrival time of the packet using the latency model
-        latency = self.latency_model.get_latency(packet.source.location, packet.destination.location)
-        arrival_tick = self.tick_count + latency
+    def message_id(self, message):
+        message_id = self.message_ids.get(message)
+        if message_id is None:
+            message_id = self.message_ids[message] = len(self.messages)
+            self.messages.append(message)
+        return message_id
 
-        # find the index to insert this new packet so in-flight list is sorted
-        left, right = 0, len(self.in_flight)
-        while left < right:
-            mid = (left + right) // 2
-            if self.in_flight[mid][0] > arrival_tick:
-                left = mid + 1
-            else:
-                right = mid
+    def send(self, packet):
+        self.transmit(packet.source, packet.destination.id, self.message_id(packet.data))
 
-        # insert the packet to be picked up later
-        self.in_flight.insert(left, (arrival_tick, packet))
+    def transmit(self, source, destination_id, message_id):
+        # Fast path of send() that never builds a Packet
+        source.sent_packet_count += 1
+        self.total_packets += 1
+        if not self.transmitter.send(self.tick_count, source.id, destination_id, message_id):
+            self.lost_packets += 1
 
     def tick(self):
-        self.tick_count += 1  # Increment tick count
+        self.advance(self.tick_count + 1)
 
-        while self.in_flight and self.in_flight[-1][0] <= self.tick_count:
-            _, packet = self.in_flight.pop()
-            packet.destination.receive_packet(packet)
-        
-        for node in self.node_list:
+    def step(self):
+        # Jump straight to the next tick that has a packet arrival. Arrival times can
+        # be fractional, so a packet is picked up on the first whole tick at or after
+        # it lands, and never on the tick it was sent (zero-latency links).
+        if self.in_flight:
+            next_tick = max(self.tick_count + 1, math.ceil(self.in_flight.next_time()))
+        else:
+            next_tick = self.tick_count + 1
+        self.advance(next_tick)
+
+    def advance(self, tick_count):
+        self.tick_count = tick_count
+        self.deliver_packets()
+        self.tick_nodes()
+
+    def deliver_packets(self):
+        node_list = self.node_list
+        for entry, destination_id in self.transmitter.deliver(self.tick_count):
+            node_list[destination_id].receive(entry)
+
+    def tick_nodes(self):
+        # Tick the active nodes in node order, which is the order a full pass over
+        # the node list would reach them in. Nodes that still have work afterwards
+        # stay active for the next tick.
+        active_nodes = sorted(self.active_nodes)
+        self.active_nodes = set()
+        for node_id in active_nodes:
+            node = self.node_list[node_id]
             node.tick()
+            if node.has_pending_work():
+                self.active_nodes.add(node_id)
 
     def is_active(self):
-        # Check if there are any codewords in transit
-        if self.in_flight:
-            return True
-
-        # Check if there are any codewords in any node's inbox
-        for node in self.node_list:
-            if node.inbox:
-                return True
-
-        return False
+        # Check if there are any codewords in transit, or in any node's inbox
+        return bool(self.in_flight) or self.queued_packets > 0
 
     def __repr__(self):
         return (f"Network(ticks={self.tick_count}, "
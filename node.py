@@ -1,46 +1,79 @@
+from collections import deque
 from strategy import Strategy
-from packet import Packet
 
 class Node:
     def __init__(self, location, id, strategy):
         self.location = location
+        self.location_id = None
         self.id = id
         self.strategy = strategy
 
         self.network = None
-        self.inbox = []
+        # Inbox entries are message_id * node_count + source id, see packet.py
+        self.inbox = deque()
         self.received_packet_count = 0
         self.sent_packet_count = 0
         self.completed = False
         self.first_packet_tick = None
-        self.remaining_recipients = set()
+
+        # The message being forwarded, and the strategy's ForwardList for it.
+        # Strategies may derive the list from the message, so it is only fixed
+        # once the node sends or receives its first packet.
+        self.message = None
+        self.message_id = None
+        self.forward_list = None
+
+        # Bitmap over the positions of the forward list that still have to be sent to
+        self.remaining_recipients = 0
 
     def set_network(self, network):
         self.network = network
-        self.strategy.set_network(network, self)
-        self.remaining_recipients = list(self.strategy.get_forward_list(None, 0))
+
+    def set_message(self, message):
+        self.message = message
+        self.message_id = self.network.message_id(message)
+        self.forward_list = self.strategy.forward_list(message)
+        self.remaining_recipients = (1 << len(self.forward_list)) - 1
 
     def receive_packet(self, packet):
-        self.inbox.append(packet)
+        self.receive(self.network.message_id(packet.data) * self.network.node_count + packet.source.id)
+
+    def receive(self, entry):
+        self.inbox.append(entry)
         self.received_packet_count += 1
+        self.network.queued_packets += 1
+        self.network.active_nodes.add(self.id)
+
+    def mark_completed(self):
+        if not self.completed:
+            self.completed = True
+            self.network.completed_count += 1
+
+    def has_pending_work(self):
+        return bool(self.inbox) or bool(self.first_packet_tick and self.remaining_recipients)
 
     def send_to_random_recipient(self):
-        recipient = self.remaining_recipients.pop()
+        # Send to the last remaining position in the forward list
+        position = self.remaining_recipients.bit_length() - 1
+        self.remaining_recipients ^= 1 << position
         self.sent_packet_count += 1
-        self.network.send(Packet(self, recipient, "start"))
+        self.network.transmit(self, self.forward_list.target(position), self.message_id)
         if not self.remaining_recipients:
-            self.completed = True
+            self.mark_completed()
 
-    def send_start_packet(self):
+    def send_start_packet(self, message="start"):
+        self.set_message(message)
         while self.remaining_recipients:
             self.send_to_random_recipient()
-        self.completed = True
+        self.mark_completed()
 
-    def handle_packet(self, packet):
-        if packet.source in self.remaining_recipients:
-            self.remaining_recipients.remove(packet.source)
+    def handle_packet(self, source_id, message_id):
+        if self.message is None:
+            self.set_message(self.network.messages[message_id])
+        if self.remaining_recipients:
+            self.remaining_recipients = self.forward_list.drop_sender(self.remaining_recipients, source_id)
         if not self.remaining_recipients:
-            self.completed = True
+            self.mark_completed()
         elif self.sent_packet_count == 0:
             # Send packets to two random recipients
             # self.send_to_random_recipient()
@@ -50,8 +83,9 @@ class Node:
         while self.inbox:
             if self.first_packet_tick == None:
                 self.first_packet_tick = self.network.tick_count
-            packet = self.inbox.pop(0)
-            self.handle_packet(packet)
+            message_id, source_id = divmod(self.inbox.popleft(), self.network.node_count)
+            self.network.queued_packets -= 1
+            self.handle_packet(source_id, message_id)
 
         while self.first_packet_tick and self.remaining_recipients:# and self.network.tick_count - self.first_packet_tick > 100:
             self.send_to_random_recipient()
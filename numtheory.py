@@ -0,0 +1,132 @@
+from functools import lru_cache
+import math
+import numpy as np
+
+# Number theory shared by the stride-based topologies: coprime sets for choosing
+# Hamiltonian cycle strides, and geometric stride series. Coprimality is read off
+# a mask sieved from the prime factors of n instead of a gcd per candidate.
+
+@lru_cache(maxsize=8)
+def primes_up_to(limit):
+    # Sieve of Eratosthenes, primes <= limit
+    is_prime = np.ones(limit + 1, dtype=bool)
+    is_prime[:2] = False
+    for p in range(2, math.isqrt(limit) + 1):
+        if is_prime[p]:
+            is_prime[p * p::p] = False
+    primes = np.flatnonzero(is_prime)
+    primes.setflags(write=False)
+    return primes
+
+def prime_factors(n):
+    # Distinct prime factors of n, by trial division with the sieved primes
+    factors = []
+    for p in primes_up_to(math.isqrt(n)).tolist():
+        if p * p > n:
+            break
+        if n % p == 0:
+            factors.append(p)
+            while n % p == 0:
+                n //= p
+    if n > 1:
+        factors.append(n)
+    return factors
+
+@lru_cache(maxsize=32)
+def coprime_mask(n):
+    # mask[x] is True if gcd(x, n) == 1, for 0 <= x < n
+    mask = np.ones(n, dtype=bool)
+    for p in prime_factors(n):
+        mask[::p] = False
+    mask.setflags(write=False)
+    return mask
+
+def coprimes_below(n, limit):
+    # Sorted numbers in [1, limit) coprime to n, for limit <= n
+    return np.flatnonzero(coprime_mask(n)[1:limit]) + 1
+
+def first_coprimes(n, count):
+    # The first count positive integers coprime to n. Coprimality repeats with
+    # period n, so past n the residues below n are reused.
+    if n == 1:
+        return np.arange(1, count + 1)
+    residues = coprimes_below(n, n)
+    periods = np.arange(math.ceil(count / len(residues)))[:, None] * n
+    return (residues[None, :] + periods).ravel()[:count]
+
+def select_geometric_series(values, k):
+    # For k targets 1, b, b^2, ..., max(values), pick the closest sorted value not
+    # picked yet, preferring the lower one on ties
+    if k == 1:
+        return [int(values[0])]
+
+    if k > len(values):
+        raise ValueError(f"k is larger than the number of values: {k} > {len(values)}")
+
+    values = np.asarray(values)
+    max_val = int(values[-1])
+
+    # Generate a target geometric series
+    base = max_val ** (1 / (k - 1))
+    targets = [(base ** i) for i in range(k)]
+
+    selected = []
+    taken = set()
+    for target, position in zip(targets, np.searchsorted(values, targets).tolist()):
+        # Nearest free values on either side of the target; at most k are taken
+        lower = position - 1
+        while lower in taken:
+            lower -= 1
+        upper = position
+        while upper in taken:
+            upper += 1
+
+        if upper >= len(values) or (lower >= 0 and abs(values[lower] - target) <= abs(values[upper] - target)):
+            index = lower
+        else:
+            index = upper
+        taken.add(index)
+        selected.append(int(values[index]))
+
+    return selected
+
+if __name__ == "__main__":
+    import random
+    import time
+
+    def gcd(a, b):
+        while b:
+            a, b = b, a % b
+        return a
+
+    def reference_series(values, k):
+        # The original linear search, kept to test the bisection against
+        base = values[-1] ** (1 / (k - 1))
+        selected, remaining = [], list(values)
+        for target in [(base ** i) for i in range(k)]:
+            closest = min(remaining, key=lambda v: abs(v - target))
+            selected.append(closest)
+            remaining.remove(closest)
+        return selected
+
+    for n in list(range(1, 400)) + [1024, 2310, 30030, 65537, 100000]:
+        if n < 400:
+            assert prime_factors(n) == [p for p in range(2, n + 1) if n % p == 0 and all(p % q for q in range(2, p))]
+        assert coprime_mask(n).tolist() == [gcd(x, n) == 1 for x in range(n)]
+        assert first_coprimes(n, 50).tolist() == [x for x in range(1, 50 * n + 2) if gcd(x, n) == 1][:50]
+
+        values = coprimes_below(n, n // 2).tolist()
+        for k in range(2, min(len(values), 30) + 1):
+            assert select_geometric_series(values, k) == reference_series(values, k)
+
+    for _ in range(200):
+        values = sorted(random.sample(range(1, 1000), random.randint(2, 100)))
+        k = random.randint(2, len(values))
+        assert select_geometric_series(values, k) == reference_series(values, k)
+
+    n = 10**7 + 1
+    start_time = time.time()
+    strides = select_geometric_series(coprimes_below(n, n // 2), 20)
+    print(f"Strides for n={n}: {strides} in {(time.time() - start_time)*1000:.1f}ms")
+
+    print("All number theory tests passed!")
@@ -1,15 +1,43 @@
+# Packets are carried through the network as plain ints rather than objects:
+# an inbox entry packs (message id, source id) and an in-flight entry adds the
+# destination id, each as one more base-node_count digit. Packet is a view of
+# one of these for code that wants named fields.
+
+# Type checks on every Packet are only worth their cost while debugging
+DEBUG = False
+
+
+def encode(message_id, source_id, destination_id, node_count):
+    return (message_id * node_count + source_id) * node_count + destination_id
+
+
+def decode(code, node_count):
+    # (message id, source id, destination id)
+    entry, destination_id = divmod(code, node_count)
+    message_id, source_id = divmod(entry, node_count)
+    return message_id, source_id, destination_id
+
 
 class Packet:
+    __slots__ = ("source", "destination", "data")
+
     def __init__(self, source, destination, data):
-        from node import Node
+        if DEBUG:
+            from node import Node
 
-        if not isinstance(source, Node):
-            raise TypeError("source must be a Node object")
-        if not isinstance(destination, Node):
-            raise TypeError("destination must be a Node object")
+            if not isinstance(source, Node):
+                raise TypeError("source must be a Node object")
+            if not isinstance(destination, Node):
+                raise TypeError("destination must be a Node object")
         self.source = source
         self.destination = destination
         self.data = data
 
+    @classmethod
+    def from_code(cls, code, network):
+        message_id, source_id, destination_id = decode(code, len(network.node_list))
+        return cls(network.node_list[source_id], network.node_list[destination_id],
+                   network.messages[message_id])
+
     def __repr__(self):
         return f"Packet(source={self.source.id}, destination={self.destination.id}, data={self.data})"
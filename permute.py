@@ -1,4 +1,6 @@
 from typing import NamedTuple
+from functools import lru_cache, wraps
+import numpy as np
 
 big_primes = [
     1050102301, 1247853853, 1491637913, 1555099697, 1770895913, 2360565041, 2699967689, 3543971273,
@@ -95,25 +97,91 @@ def inverse(y, p):
 
     return result
 
-# Example usage
-for n in range(10, 10000):
+# Array versions of permute and inverse: the same rounds applied to a whole array
+# of indices at once. Intermediate products stay below n^2 + n, so they fit in
+# uint64 for n < 2^32.
+def permute_array(i, p):
+    result = np.asarray(i, dtype=np.uint64)
+    n = np.uint64(p.n)
+    xor_range = np.uint64(p.xor_range)
+
+    result = np.where(result < xor_range, result ^ np.uint64(p.xor1), result)
+    result = (result * np.uint64(p.cp1) + np.uint64(p.offset1)) % n
+    result = np.where(result < xor_range, result ^ np.uint64(p.xor2), result)
+    result = (result * np.uint64(p.cp2) + np.uint64(p.offset2)) % n
+
+    return result.astype(np.int64)
+
+def inverse_array(y, p):
+    result = np.asarray(y, dtype=np.uint64)
+    n = np.uint64(p.n)
+    xor_range = np.uint64(p.xor_range)
+
+    result = ((result + n - np.uint64(p.offset2)) % n * np.uint64(p.inv2)) % n
+    result = np.where(result < xor_range, result ^ np.uint64(p.xor2), result)
+    result = ((result + n - np.uint64(p.offset1)) % n * np.uint64(p.inv1)) % n
+    result = np.where(result < xor_range, result ^ np.uint64(p.xor1), result)
+
+    return result.astype(np.int64)
+
+def resizable_cache(maxsize):
+    # lru_cache whose size can be raised later with .reserve(size), for caches
+    # keyed by message that have to hold every message in flight at once.
+    # Growing the cache starts it empty.
+    def decorator(function):
+        cache = lru_cache(maxsize)(function)
+
+        @wraps(function)
+        def cached(*args):
+            return cache(*args)
+
+        def reserve(size):
+            nonlocal cache
+            if size > cache.cache_info().maxsize:
+                cache = lru_cache(size)(function)
+
+        cached.reserve = reserve
+        cached.cache_info = lambda: cache.cache_info()
+        cached.cache_clear = lambda: cache.cache_clear()
+        return cached
+    return decorator
+
+# Full tables for a (n, salt) pair, so permuting a whole node range for a message
+# is a single lookup. Each table is 8n bytes, hence the small cache.
+@lru_cache(maxsize=16)
+def permutation_table(n, salt):
+    table = permute_array(np.arange(n), create_params(n, salt))
+    table.setflags(write=False)
+    return table
+
+@lru_cache(maxsize=16)
+def inverse_table(n, salt):
+    table = inverse_array(np.arange(n), create_params(n, salt))
+    table.setflags(write=False)
+    return table
+
+if __name__ == "__main__":
     import random
     import mmh3
 
-    # NOTE: In production, we'll use the secure hash of the message as the salt, so
-    # for testing, we use a simple hash function that has good distribution properties.
-    salt = mmh3.hash128("permute", seed=random.randint(0, 2**32-1))
-
-    # # Test the bijection and its inverse
-    # print(f"n: {n}, salt: 0x{salt:016x}")
-    params = create_params(n, salt)
-    # print(f"cp1: {params.cp1}, inv1: {params.inv1}, offset1: {params.offset1}, "
-    #       f"cp2: {params.cp2}, inv2: {params.inv2}, offset2: {params.offset2}, "
-    #       f"xor_range: {params.xor_range}, xor1: 0x{params.xor1:04x}, xor2: 0x{params.xor2:04x}")
-
-    for i in range(n):
-        permuted = permute(i, params)
-        assert permuted < n and permuted >= 0 # Ensure the result is in the range [0, n)
-        inversed = inverse(permuted, params)
-        # print(f"Original: {i}, Permuted: {permuted}, Inversed: {inversed}")
-        assert inversed == i  # Ensure invertibility
\ No newline at end of file
+    for n in range(10, 10000):
+        # NOTE: In production, we'll use the secure hash of the message as the salt, so
+        # for testing, we use a simple hash function that has good distribution properties.
+        salt = mmh3.hash128("permute", seed=random.randint(0, 2**32-1))
+
+        params = create_params(n, salt)
+        table = permutation_table(n, salt)
+        inverses = inverse_table(n, salt)
+
+        # Ensure the table is a bijection on [0, n) and the inverse undoes it
+        assert np.array_equal(np.sort(table), np.arange(n))
+        assert np.array_equal(inverses[table], np.arange(n))
+
+        # The scalar functions are the reference: check every index for small n
+        # and a sample of them for the rest
+        indices = range(n) if n < 500 else random.sample(range(n), 100)
+        for i in indices:
+            assert table[i] == permute(i, params)
+            assert inverses[table[i]] == inverse(permute(i, params), params)
+
+    print("All permutation tests passed!")
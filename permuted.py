@@ -0,0 +1,154 @@
+from functools import lru_cache
+import hashlib
+import numpy as np
+from strategy import Strategy, ForwardList
+from hamiltonian import stride_plan
+from permute import create_params, permute, inverse, permutation_table, inverse_table, resizable_cache
+from topology import Topology
+
+# Hamiltonian cycles in a per-message permuted id space: node i sits at position
+# permute(i) and forwards to the nodes at position +/- stride, mapped back with
+# inverse(). Every message gets its own salt, so its own overlay. A node only
+# keeps its permuted position; targets, and the position a sender holds, are
+# computed from the shared per-message parameters on demand.
+
+def message_salt(message):
+    # create_params consumes 128 bits of salt
+    digest = hashlib.blake2b(str(message).encode(), digest_size=16).digest()
+    return int.from_bytes(digest, "little")
+
+@resizable_cache(maxsize=64)
+def message_plan(node_count, degree, message):
+    # Permutation parameters and stride plan for one message, shared by every node
+    salt = message_salt(message)
+    return salt, create_params(node_count, salt), stride_plan(node_count, degree)
+
+@lru_cache(maxsize=64)
+def offset_positions(node_count, degree):
+    # Stride offsets as ints, and the forward list positions of each offset; an
+    # offset repeats when a stride is exactly n / 2
+    offsets = stride_plan(node_count, degree).offsets.tolist()
+    positions = {}
+    for position, offset in enumerate(offsets):
+        positions.setdefault(offset, []).append(position)
+    return offsets, positions
+
+def permuted_topology(node_count, degree, message):
+    # The overlay of one message for the whole network at once, with each row in
+    # the same order as PermutationStrategy.get_forward_list
+    salt, _, plan = message_plan(node_count, degree, message)
+    positions = permutation_table(node_count, salt)
+    targets = inverse_table(node_count, salt)[(positions[:, None] + plan.offsets[None, :]) % node_count]
+    return Topology(np.arange(node_count + 1, dtype=np.int64) * len(plan.offsets), targets.ravel())
+
+class PermutedForwardList(ForwardList):
+    __slots__ = ("position", "params", "offsets", "offset_positions")
+
+    def __init__(self, position, params, offsets, offset_positions):
+        self.position = position
+        self.params = params
+        self.offsets = offsets
+        self.offset_positions = offset_positions
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def target(self, position):
+        return inverse((self.position + self.offsets[position]) % self.params.n, self.params)
+
+    def positions(self, node_id):
+        offset = (permute(node_id, self.params) - self.position) % self.params.n
+        return self.offset_positions.get(offset, [])
+
+class PermutationStrategy(Strategy):
+    def __init__(self, degree=4):
+        super().__init__()
+        self.degree = degree
+
+    def reserve_messages(self, count):
+        # Every node shares the plan cache, so growing it again is a no-op. The
+        # permutation tables are 8n bytes each and keep their fixed bound.
+        message_plan.reserve(count)
+
+    def forward_list(self, codeword_id):
+        node_count = len(self.network.node_list)
+        _, params, _ = message_plan(node_count, self.degree, codeword_id)
+        offsets, positions = offset_positions(node_count, self.degree)
+        return PermutedForwardList(permute(self.node.id, params), params, offsets, positions)
+
+    def get_forward_list(self, sender, codeword_id):
+        forward_list = self.forward_list(codeword_id)
+        neighbors = np.array([forward_list.target(position) for position in range(len(forward_list))],
+                             dtype=np.int64)
+        if sender is None:
+            return neighbors
+        else:
+            return neighbors[neighbors != sender.id]
+
+if __name__ == "__main__":
+    import io
+    import random
+    import time
+    import tracemalloc
+    from contextlib import redirect_stdout
+    from network import Network
+    from latency import LatencyModel
+    from latency_data import latency_data
+    from node import Node
+    from gossip import GreedyGossipStrategy, RandomGossipStrategy, HalfGreedyGossipStrategy
+    from hamiltonian import HamiltonionStrategy
+    from dissemination import disseminate
+    from netsim import run_simulation
+
+    lat = LatencyModel(latency_data, provider_list=["AWS", "Azure", "Google"])
+
+    # Per-node forward lists match the vectorized overlay, and the packet
+    # simulation matches the analytic dissemination over it
+    node_count = 300
+    degree = 10
+    for message in ["start", "block-1", 12345]:
+        locations = random.choices(lat.locations, k=node_count)
+        nodes = [Node(locations[i], i, PermutationStrategy(degree)) for i in range(node_count)]
+        network = Network(nodes, lat)
+        network.initialize()
+
+        topology = permuted_topology(node_count, degree, message)
+        for node in nodes:
+            forward_list = node.strategy.get_forward_list(None, message)
+            assert np.array_equal(forward_list, topology.neighbors_of(node.id))
+            assert node.id not in forward_list
+            assert len(set(forward_list.tolist())) == degree
+
+            # The node keeps no array; positions() inverts target()
+            plan = node.strategy.forward_list(message)
+            for node_id in range(node_count):
+                assert plan.positions(node_id) == (forward_list == node_id).nonzero()[0].tolist()
+
+        result = disseminate(network, 0, topology)
+        with redirect_stdout(io.StringIO()):
+            completion_time = run_simulation(network, 0, event_driven=True, message=message)
+        assert result.completion_time == completion_time
+        assert result.total_packets == network.total_packets
+
+    # Two messages get different overlays
+    assert not np.array_equal(permuted_topology(node_count, degree, "a").neighbors,
+                              permuted_topology(node_count, degree, "b").neighbors)
+    print("Permuted forward lists match the simulation!")
+
+    # Setup cost against the strategies that store neighbor lists
+    node_count = 100000
+    locations = random.choices(lat.locations, k=node_count)
+    for strategy in [GreedyGossipStrategy, RandomGossipStrategy, HalfGreedyGossipStrategy,
+                     HamiltonionStrategy, PermutationStrategy]:
+        tracemalloc.start()
+        start_time = time.time()
+        nodes = [Node(locations[i], i, strategy(degree)) for i in range(node_count)]
+        network = Network(nodes, lat)
+        network.initialize()
+        setup_time = time.time() - start_time
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        print(f"{strategy.__name__}: setup {setup_time:.2f}s, peak {peak / 2**20:.1f} MiB, "
+              f"topology {network.topology.neighbors.nbytes / 2**20:.1f} MiB")
+        del nodes, network
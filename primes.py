@@ -1,34 +1,37 @@
-import sympy
+from multiprocessing import Pool
+import math
+import numpy as np
+from numtheory import primes_up_to
+
+def miller_rabin(n, bases):
+    # Write n - 1 as d * 2^r
+    r, d = 0, n - 1
+    while d % 2 == 0:
+        d //= 2
+        r += 1
+
+    # Test each base
+    for a in bases:
+        if a >= n:
+            a %= n
+        if a < 2:
+            return True
+
+        x = pow(a, d, n)  # a^d % n
+        if x == 1 or x == n - 1:
+            continue
+        for _ in range(r - 1):
+            x = pow(x, 2, n)
+            if x == n - 1:
+                break
+        else:
+            return False
+    return True
 
 def cheeky_prime_test(n):
     # This is a modified version of the primality test from sympy.isprime, it only
     # checks for primality up to 885594169, but is a bit faster. (Which is perfect for our purposes!)
     # Original code here: https://github.com/sympy/sympy/blob/master/sympy/ntheory/primetest.py#L226
-    def miller_rabin(n, bases):
-        # Write n - 1 as d * 2^r
-        r, d = 0, n - 1
-        while d % 2 == 0:
-            d //= 2
-            r += 1
-
-        # Test each base
-        for a in bases:
-            if a >= n:
-                a %= n
-            if a < 2:
-                return True
-
-            x = pow(a, d, n)  # a^d % n
-            if x == 1 or x == n - 1:
-                continue
-            for _ in range(r - 1):
-                x = pow(x, 2, n)
-                if x == n - 1:
-                    break
-            else:
-                return False
-        return True
-
     if n in [2, 3, 5]:
         return True
     if n < 2 or (n % 2) == 0 or (n % 3) == 0 or (n % 5) == 0:
@@ -55,43 +58,227 @@ def cheeky_prime_test(n):
     return False
 
 
-import random
+# Batch primality. Ranges are answered exactly by a segmented sieve; arbitrary
+# arrays go through a small-prime wheel and then Miller-Rabin, run on all the
+# survivors at once with uint64 arithmetic. Bases 2..17 are deterministic below
+# 341550071728321, which covers every n < 2^47, the largest modulus the limb
+# multiplication below can handle.
+
+WHEEL_PRIMES = [2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41, 43, 47]
+MILLER_RABIN_BASES = [2, 3, 5, 7, 11, 13, 17]
+MILLER_RABIN_LIMIT = 1 << 47
+LARGE_BASES = [2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37]  # deterministic below 3.3e24
+SEGMENT_SIZE = 1 << 22
+CHUNK_SIZE = 1 << 20
+
+def mulmod(a, b, n):
+    # a * b % n elementwise for a, b < n. Below 2^32 the product fits in uint64;
+    # up to 2^47, b is split into three 16-bit limbs and folded in Horner style so
+    # no intermediate exceeds 2^64.
+    if int(n.max(initial=0)) < 1 << 32:
+        return a * b % n
+    result = np.zeros_like(a)
+    for shift in (np.uint64(32), np.uint64(16), np.uint64(0)):
+        limb = (b >> shift) & np.uint64(0xFFFF)
+        result = ((result << np.uint64(16)) % n + a * limb) % n
+    return result
+
+def powmod(a, d, n):
+    # a^d % n elementwise, by square and multiply over the bits of d
+    result = np.ones_like(a)
+    a = a % n
+    for bit in range(int(d.max(initial=0)).bit_length()):
+        odd = ((d >> np.uint64(bit)) & np.uint64(1)).astype(bool)
+        result = np.where(odd, mulmod(result, a, n), result)
+        a = mulmod(a, a, n)
+    return result
+
+def miller_rabin_array(n, bases):
+    # Vectorized miller_rabin. bases holds one base per row, either a scalar for
+    # every lane or an array with one per lane, tried in order like the scalar
+    # version: a base reduced below 2 passes the lane outright.
+    one = np.uint64(1)
+    d = n - one
+    r = np.zeros(len(n), dtype=np.int64)
+    even = d & one == 0
+    while even.any():
+        d[even] >>= one
+        r[even] += 1
+        even = d & one == 0
+
+    prime = np.ones(len(n), dtype=bool)
+    decided = np.zeros(len(n), dtype=bool)
+    for a in bases:
+        a = np.broadcast_to(np.asarray(a, dtype=np.uint64), n.shape) % n
+        trivial = a < 2
+        x = powmod(a, d, n)
+        witness = (x == one) | (x == n - one)
+        for i in range(1, int(r.max(initial=0))):
+            x = mulmod(x, x, n)
+            witness |= (x == n - one) & (i < r)
+        prime &= decided | trivial | witness
+        decided |= trivial & prime
+    return prime
+
+def sieve_segment(bounds):
+    # Exact primality of start <= i < stop, crossing off multiples of the primes
+    # up to sqrt(stop)
+    start, stop = bounds
+    prime = np.ones(stop - start, dtype=bool)
+    prime[:max(0, min(2, stop) - start)] = False
+    for p in primes_up_to(math.isqrt(max(stop - 1, 0))).tolist():
+        first = max(p * p, -(-start // p) * p)
+        prime[first - start::p] = False
+    return prime
+
+small_prime_mask = sieve_segment((0, 2809))
+
+def prime_mask(start, stop, processes=None):
+    # Sieve [start, stop) segment by segment, in parallel when there are several
+    segments = [(s, min(s + SEGMENT_SIZE, stop)) for s in range(start, stop, SEGMENT_SIZE)]
+    if not segments:
+        return np.zeros(0, dtype=bool)
+    if len(segments) == 1 or processes == 1:
+        return np.concatenate([sieve_segment(segment) for segment in segments])
+    with Pool(processes) as pool:
+        return np.concatenate(pool.map(sieve_segment, segments))
+
+def is_prime_chunk(n):
+    n = np.asarray(n, dtype=np.uint64)
+    prime = np.zeros(len(n), dtype=bool)
+
+    # Small values are looked up in a sieve, the rest lose their multiples of
+    # the wheel primes before Miller-Rabin
+    small = n < 2809
+    prime[small] = small_prime_mask[n[small].astype(np.int64)]
+    candidates = ~small
+    for p in WHEEL_PRIMES:
+        candidates &= n % np.uint64(p) != 0
+
+    vectorized = candidates & (n < MILLER_RABIN_LIMIT)
+    prime[vectorized] = miller_rabin_array(n[vectorized], MILLER_RABIN_BASES)
+    for i in np.flatnonzero(candidates & ~vectorized).tolist():
+        prime[i] = miller_rabin(int(n[i]), LARGE_BASES)
+    return prime
+
+def is_prime_batch(values, processes=None):
+    # Primality of every value in a range or array of non-negative integers below
+    # 2^64. Step-1 ranges are sieved; anything else is tested value by value.
+    # Large inputs are split across a process pool.
+    if isinstance(values, range) and values.step == 1:
+        return prime_mask(values.start, values.stop, processes)
+
+    values = np.asarray(values, dtype=np.uint64)
+    chunks = [values[i:i + CHUNK_SIZE] for i in range(0, len(values), CHUNK_SIZE)]
+    if len(chunks) <= 1 or processes == 1:
+        return np.concatenate([is_prime_chunk(chunk) for chunk in chunks] or [np.zeros(0, dtype=bool)])
+    with Pool(processes) as pool:
+        return np.concatenate(pool.map(is_prime_chunk, chunks))
+
+def cheeky_prime_test_array(values):
+    # cheeky_prime_test on a whole array at once, with the same answers, including
+    # False for everything at or above 885594169
+    n = np.asarray(values, dtype=np.uint64)
+    prime = np.zeros(len(n), dtype=bool)
+
+    prime[(n == 2) | (n == 3) | (n == 5)] = True
+    rest = (n >= 7)
+    for p in WHEEL_PRIMES[:3]:
+        rest &= n % np.uint64(p) != 0
+    prime[rest & (n < 49)] = True
+    rest &= n >= 49
+    for p in WHEEL_PRIMES[3:]:
+        rest &= n % np.uint64(p) != 0
+    prime[rest & (n < 2809)] = True
+    rest &= n >= 2809
+
+    fermat = rest & (n < 65077) & ~np.isin(n, [8321, 31621, 42799, 49141, 49981])
+    m = n[fermat]
+    x = powmod(np.full(len(m), 2, dtype=np.uint64), m >> np.uint64(1), m)
+    prime[fermat] = (x == 1) | (x == m - np.uint64(1))
+
+    one_base = rest & (n >= 65077) & (n < 341531)
+    prime[one_base] = miller_rabin_array(n[one_base], [9345883071009581737])
+    two_bases = rest & (n >= 341531) & (n < 885594169)
+    prime[two_bases] = miller_rabin_array(n[two_bases], [725270293939359937, 3569819667048198375])
+    return prime
+
+def find_big_primes(count, low=1000000000, high=9999999999, seed=None, block_size=4096):
+    # count distinct random primes in [low, high], testing candidates in blocks
+    rng = np.random.default_rng(seed)
+    found = []
+    while len(found) < count:
+        candidates = rng.integers(low, high, size=block_size, endpoint=True, dtype=np.uint64)
+        for p in candidates[is_prime_batch(candidates)].tolist():
+            if p not in found and len(found) < count:
+                found.append(p)
+    return sorted(found)
+
+def verify_segment(bounds):
+    # Values in [start, stop) where the batch tests disagree with the sieve
+    start, stop = bounds
+    expected = sieve_segment(bounds)
+    values = np.arange(start, stop, dtype=np.uint64)
+    mismatches = values[(cheeky_prime_test_array(values) != expected) | (is_prime_chunk(values) != expected)]
+    return mismatches.tolist()
 
-found_primes = []
+if __name__ == "__main__":
+    import argparse
+    import random
+    import time
+    import sympy
 
-while len(found_primes) < 32:
-    test_val = random.randint(1000000000, 9999999999)
-    if sympy.isprime(test_val):
-        found_primes.append(test_val)
-        print(f"{test_val} is prime")
+    parser = argparse.ArgumentParser(description="Batch primality checks and big prime generation")
+    parser.add_argument("command", choices=["big-primes", "verify", "benchmark"])
+    parser.add_argument("--limit", type=int, default=100000000)
+    parser.add_argument("--count", type=int, default=32)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--processes", type=int, default=None)
+    args = parser.parse_args()
 
-found_primes.sort()
-print(found_primes)
+    if args.command == "big-primes":
+        # Regenerate permute.big_primes
+        found_primes = find_big_primes(args.count, seed=args.seed)
+        assert all(sympy.isprime(p) for p in found_primes)
+        print(found_primes)
 
-exit()
+    elif args.command == "verify":
+        # The sieve is exact, so check both batch tests against it for every
+        # number below the limit, and spot check the scalar tests against sympy
+        print("Checking for correctness...")
+        segments = [(s, min(s + SEGMENT_SIZE, args.limit)) for s in range(0, args.limit, SEGMENT_SIZE)]
+        with Pool(args.processes) as pool:
+            for done, mismatches in enumerate(pool.imap(verify_segment, segments), 1):
+                print(f"\r{segments[done - 1][1]//1000000}M/{args.limit//1000000}M... ", end="", flush=True)
+                if mismatches:
+                    print(f"mismatches: {mismatches[:10]}")
+                    exit(1)
+        print()
 
-# Checking all numbers from 1 to 1,000,000 against both Miller-Rabin and sympy's isprime for comparison
-limit = 100000000
-import time
+        for i in random.sample(range(args.limit), 100000):
+            assert cheeky_prime_test(i) == sympy.isprime(i), i
+        candidates = [random.randrange(2**47, 2**64) for _ in range(1000)]
+        assert is_prime_batch(candidates).tolist() == [sympy.isprime(i) for i in candidates]
+        print("All primality tests passed!")
 
-# Check if the cheeky prime test matches sympy's isprime for all numbers up to 1,000,000
-print("Checking for correctness...")
-for i in range(limit):
-    if i % 1000000 == 0:
-        print(f"\r{i//1000000}M/{limit//1000000}M... ", end="", flush=True)
-    if cheeky_prime_test(i) != sympy.isprime(i):
-        print(f"{i} mismatch: {cheeky_prime_test(i)} {sympy.isprime(i)}")
-        exit()
-print(f"\r{limit//1000000}M/{limit//1000000}M... ", flush=True)
+    elif args.command == "benchmark":
+        print("Checking performance...")
+        start_time = time.time()
+        prime_mask(0, args.limit, args.processes)
+        print(f"Sieve up to {args.limit} took {time.time() - start_time:.2f} seconds")
 
+        sample = min(args.limit, 1000000)
+        start_time = time.time()
+        cheeky_prime_test_array(np.arange(sample, dtype=np.uint64))
+        batch_time = time.time() - start_time
+        print(f"Batch cheeky test up to {sample} took {batch_time:.2f} seconds")
 
-print("Checking performance...")
-start_time = time.time()
-cheeky_results = [cheeky_prime_test(n) for n in range(1, limit + 1)]
-cheeky_time = time.time() - start_time
-print(f"Cheeky test took {cheeky_time:.2f} seconds")
+        start_time = time.time()
+        cheeky_results = [cheeky_prime_test(n) for n in range(sample)]
+        cheeky_time = time.time() - start_time
+        print(f"Cheeky test up to {sample} took {cheeky_time:.2f} seconds")
 
-start_time = time.time()
-sympy_results = [sympy.isprime(n) for n in range(1, limit + 1)]
-sympy_time = time.time() - start_time
-print(f"Sympy test took {sympy_time:.2f} seconds")
\ No newline at end of file
+        start_time = time.time()
+        sympy_results = [sympy.isprime(n) for n in range(sample)]
+        sympy_time = time.time() - start_time
+        print(f"Sympy test up to {sample} took {sympy_time:.2f} seconds")
@@ -0,0 +1,155 @@
+from collections import Counter
+import json
+import time
+
+# Opt-in instrumentation for a simulation run. Attaching a Profiler to a Network
+# replaces the network's hot-path methods on that instance with timed wrappers,
+# so networks without one run the plain methods. It collects wall time per
+# phase, packet and node counters, the inbox depth distribution, and a time
+# series of progress sampled every sample_interval simulated ms.
+
+PHASES = ["delivery", "node_processing", "sending", "completion_check"]
+
+
+class Profiler:
+    def __init__(self, sample_interval=1000, progress=False):
+        self.sample_interval = sample_interval
+        self.progress = progress
+        self.network = None
+
+        self.phase_times = dict.fromkeys(PHASES, 0.0)
+        self.counters = Counter()
+        self.in_flight_high_water = 0
+        self.inbox_depths = Counter()
+        self.samples = {"tick": [], "completed_nodes": [], "in_flight": [], "total_packets": []}
+        self.next_sample = 0
+        self.start_time = None
+        self.wall_time = 0.0
+
+    def attach(self, network):
+        self.network = network
+        perf_counter = time.perf_counter
+        phase_times = self.phase_times
+        deliver_packets = network.deliver_packets
+        tick_nodes = network.tick_nodes
+        transmit = network.transmit
+        is_active = network.is_active
+
+        def timed_deliver_packets():
+            queued = network.queued_packets
+            start = perf_counter()
+            deliver_packets()
+            phase_times["delivery"] += perf_counter() - start
+            self.counters["packets_delivered"] += network.queued_packets - queued
+
+        def timed_tick_nodes():
+            # Inbox depth of every node about to be ticked
+            for node_id in network.active_nodes:
+                self.inbox_depths[len(network.node_list[node_id].inbox)] += 1
+            self.counters["node_ticks"] += len(network.active_nodes)
+            self.counters["advances"] += 1
+
+            # Sends happen while nodes are ticked; count them as sending only
+            sending = phase_times["sending"]
+            start = perf_counter()
+            tick_nodes()
+            elapsed = perf_counter() - start
+            phase_times["node_processing"] += elapsed - (phase_times["sending"] - sending)
+            self.sample()
+
+        def timed_transmit(source, destination_id, message_id):
+            start = perf_counter()
+            transmit(source, destination_id, message_id)
+            phase_times["sending"] += perf_counter() - start
+            if len(network.in_flight) > self.in_flight_high_water:
+                self.in_flight_high_water = len(network.in_flight)
+
+        def timed_is_active():
+            start = perf_counter()
+            active = is_active()
+            phase_times["completion_check"] += perf_counter() - start
+            return active
+
+        network.deliver_packets = timed_deliver_packets
+        network.tick_nodes = timed_tick_nodes
+        network.transmit = timed_transmit
+        network.is_active = timed_is_active
+
+    def start(self, network):
+        self.start_time = time.perf_counter()
+        self.sample(force=True)
+
+    def stop(self, network):
+        self.wall_time = time.perf_counter() - self.start_time
+        if not self.samples["tick"] or self.samples["tick"][-1] != network.tick_count:
+            self.sample(force=True)
+
+    def sample(self, force=False):
+        network = self.network
+        if network.tick_count < self.next_sample and not force:
+            return
+        self.next_sample = (network.tick_count // self.sample_interval + 1) * self.sample_interval
+
+        self.samples["tick"].append(network.tick_count)
+        self.samples["completed_nodes"].append(network.completed_count)
+        self.samples["in_flight"].append(len(network.in_flight))
+        self.samples["total_packets"].append(network.total_packets)
+        if self.progress:
+            print(f" {network.tick_count/1000}s: {network.completed_count}/{len(network.node_list)} "
+                  f"{len(network.in_flight)}/{network.total_packets}")
+
+    def report(self):
+        network = self.network
+        events = network.total_packets + self.counters["packets_delivered"]
+        return {
+            "wall_time": self.wall_time,
+            "ticks": network.tick_count,
+            "phases": dict(self.phase_times),
+            "counters": {
+                "advances": self.counters["advances"],
+                "node_ticks": self.counters["node_ticks"],
+                "packets_sent": network.total_packets,
+                "packets_lost": network.lost_packets,
+                "packets_delivered": self.counters["packets_delivered"],
+                "in_flight_high_water": self.in_flight_high_water,
+                "events_per_second": events / self.wall_time if self.wall_time else None,
+            },
+            "inbox_depth": {str(depth): count for depth, count in sorted(self.inbox_depths.items())},
+            "samples": self.samples,
+        }
+
+    def to_json(self, path=None):
+        report = json.dumps(self.report(), indent=2)
+        if path is not None:
+            with open(path, "w") as f:
+                f.write(report)
+        return report
+
+
+if __name__ == "__main__":
+    import random
+    from network import Network
+    from latency import LatencyModel
+    from latency_data import latency_data
+    from node import Node
+    from gossip import RandomGossipStrategy
+    from netsim import run_simulation
+
+    lat = LatencyModel(latency_data, provider_list=["AWS", "Azure", "Google"])
+    node_count = 20000
+    locations = random.choices(lat.locations, k=node_count)
+
+    for profiler in [None, Profiler(sample_interval=100, progress=True)]:
+        random.seed(1)
+        nodes = [Node(locations[i], i, RandomGossipStrategy(10)) for i in range(node_count)]
+        network = Network(nodes, lat, profiler=profiler)
+        network.initialize()
+
+        start_time = time.perf_counter()
+        run_simulation(network, 0, event_driven=True)
+        print(f" Wall time: {time.perf_counter() - start_time:.2f}s")
+
+    report = profiler.report()
+    assert report["counters"]["packets_delivered"] == sum(node.received_packet_count for node in nodes)
+    assert report["samples"]["completed_nodes"][-1] == network.completed_count
+    print(json.dumps({key: report[key] for key in ["wall_time", "phases", "counters", "inbox_depth"]}, indent=2))
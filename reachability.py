@@ -0,0 +1,88 @@
+import numpy as np
+
+# Reachability from a source node with a set of failed nodes removed, without
+# copying the graph. The bit-sliced version runs 64 failure sets at once: every
+# node holds a uint64 word whose bit b says "reached in failure set b", and a BFS
+# step is a handful of AND/OR operations over the frontier's out-edges. Graphs are
+# anything with node_count and successors(), such as topology.Topology or
+# circulant.CirculantGraph.
+
+WORD_BITS = 64
+
+
+def reachable_count(graph, source, failed):
+    # Reference BFS: number of nodes reachable from source, not counting source,
+    # with the failed nodes removed
+    alive = np.ones(graph.node_count, dtype=bool)
+    alive[list(failed)] = False
+    reached = np.zeros(graph.node_count, dtype=bool)
+    reached[source] = True
+    frontier = np.array([source])
+    while len(frontier):
+        _, targets = graph.successors(frontier)
+        targets = np.unique(targets[alive[targets] & ~reached[targets]])
+        reached[targets] = True
+        frontier = targets
+    return int(reached.sum()) - 1
+
+
+def reachable_counts(graph, source, failure_sets):
+    # Bit-sliced BFS over up to 64 failure sets per pass. Returns, for every failure
+    # set, the number of nodes reachable from source (not counting source).
+    failure_sets = list(failure_sets)
+    counts = np.zeros(len(failure_sets), dtype=np.int64)
+    for start in range(0, len(failure_sets), WORD_BITS):
+        batch = failure_sets[start:start + WORD_BITS]
+        counts[start:start + len(batch)] = _reachable_word(graph, source, batch)
+    return counts
+
+
+def _reachable_word(graph, source, batch):
+    all_bits = np.uint64((1 << len(batch)) - 1)
+
+    # alive[v] has bit b set unless v failed in set b
+    alive = np.full(graph.node_count, all_bits, dtype=np.uint64)
+    for bit, failed in enumerate(batch):
+        alive[list(failed)] &= ~np.uint64(1 << bit)
+
+    reached = np.zeros(graph.node_count, dtype=np.uint64)
+    reached[source] = alive[source]
+    frontier = np.array([source])
+    delta = reached[frontier]
+
+    # Only the newly reached bits of each frontier node are pushed along its edges
+    while len(frontier):
+        owners, targets = graph.successors(frontier)
+        pushed = delta[owners] & alive[targets] & ~reached[targets]
+        incoming = np.zeros(graph.node_count, dtype=np.uint64)
+        np.bitwise_or.at(incoming, targets, pushed)
+        frontier = np.flatnonzero(incoming)
+        delta = incoming[frontier]
+        reached[frontier] |= delta
+
+    # Population count of each bit position across all nodes
+    bits = np.unpackbits(reached.view(np.uint8).reshape(-1, 8), axis=1, bitorder="little")
+    return bits.sum(axis=0)[:len(batch)] - 1
+
+
+if __name__ == "__main__":
+    import random
+    from topology import Topology, TopologyBuilder
+
+    # Check the bit-sliced kernel against the reference BFS on random graphs
+    for n in [10, 50, 200]:
+        for edges_per_node in [1, 2, 4]:
+            src = np.repeat(np.arange(n), edges_per_node)
+            dst = np.random.randint(0, n, len(src))
+            graph = Topology.from_edges(src, dst, n)
+            failure_sets = [random.sample(range(1, n), n // 3) for _ in range(150)]
+            expected = [reachable_count(graph, 0, failed) for failed in failure_sets]
+            assert list(reachable_counts(graph, 0, failure_sets)) == expected
+
+            # A network's own topology, built node by node, runs as is
+            builder = TopologyBuilder()
+            for node in range(n):
+                builder.add(graph.neighbors_of(node).tolist())
+            assert list(reachable_counts(builder.build(), 0, failure_sets)) == expected
+
+    print("All reachability tests passed!")
@@ -1,3 +1,35 @@
+import numpy as np
+
+
+class ForwardList:
+    # A node's forward list for one message, read by position. This one wraps the
+    # array from get_forward_list(); strategies that can compute their targets
+    # return their own with the same methods instead of storing an array.
+    __slots__ = ("targets",)
+
+    def __init__(self, targets):
+        self.targets = np.asarray(targets)
+
+    def __len__(self):
+        return len(self.targets)
+
+    def target(self, position):
+        return int(self.targets[position])
+
+    def positions(self, node_id):
+        # Positions that forward to node_id, in order
+        return np.flatnonzero(self.targets == node_id).tolist()
+
+    def drop_sender(self, remaining, node_id):
+        # Clear the first position in the remaining-recipients bitmap that still
+        # forwards to node_id, the forwarding rule shared by Node and
+        # BroadcastSimulator
+        for position in self.positions(node_id):
+            if remaining >> position & 1:
+                return remaining ^ (1 << position)
+        return remaining
+
+
 class Strategy:
     def __init__(self):
         self.network = None
@@ -7,5 +39,23 @@ class Strategy:
         self.network = network
         self.node = node
 
+    def select_neighbors(self):
+        # Neighbor ids this node adds to the network topology. Strategies that
+        # compute their forward lists on the fly leave their row empty.
+        return []
+
+    @property
+    def neighbors(self):
+        return self.network.topology.neighbors_of(self.node.id)
+
     def get_forward_list(self, sender, codeword_id):
         raise NotImplementedError
+
+    def reserve_messages(self, count):
+        # Called with the number of messages that may be in flight at once, for
+        # strategies that cache per-message state
+        pass
+
+    def forward_list(self, codeword_id):
+        # What a node keeps while it forwards codeword_id
+        return ForwardList(self.get_forward_list(None, codeword_id))
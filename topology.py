@@ -0,0 +1,77 @@
+from array import array
+import numpy as np
+
+
+class Topology:
+    # Network topology in CSR form: the neighbors of node i are
+    # neighbors[offsets[i]:offsets[i + 1]], as node indices. Edges are directed,
+    # from a node to each of its neighbors.
+    def __init__(self, offsets, neighbors):
+        self.offsets = offsets
+        self.neighbors = neighbors
+
+    @classmethod
+    def from_edges(cls, src, dst, node_count):
+        src = np.asarray(src, dtype=np.int64)
+        dst = np.asarray(dst, dtype=np.int64)
+        order = np.argsort(src, kind="stable")
+        offsets = np.zeros(node_count + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=node_count), out=offsets[1:])
+        return cls(offsets, dst[order])
+
+    @classmethod
+    def from_networkx(cls, G, node_count):
+        # Undirected edges become one edge each way
+        if G.number_of_edges() == 0:
+            return cls.from_edges([], [], node_count)
+        src, dst = np.array(list(G.edges()), dtype=np.int64).T
+        if not G.is_directed():
+            src, dst = np.concatenate([src, dst]), np.concatenate([dst, src])
+        return cls.from_edges(src, dst, node_count)
+
+    @property
+    def node_count(self):
+        return len(self.offsets) - 1
+
+    def neighbors_of(self, node_id):
+        return self.neighbors[self.offsets[node_id]:self.offsets[node_id + 1]]
+
+    def successors(self, nodes):
+        # Out-edges of all the given nodes at once, as (index into nodes, target)
+        starts = self.offsets[nodes]
+        counts = self.offsets[nodes + 1] - starts
+        owners = np.repeat(np.arange(len(nodes)), counts)
+        edges = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) + np.repeat(starts, counts)
+        return owners, self.neighbors[edges]
+
+    def degree(self, node_id):
+        return int(self.offsets[node_id + 1] - self.offsets[node_id])
+
+    def degrees(self):
+        return np.diff(self.offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __repr__(self):
+        return f"Topology(nodes={len(self)}, edges={len(self.neighbors)})"
+
+
+class TopologyBuilder:
+    # Collects neighbor lists one node at a time into flat typed arrays, so no
+    # per-node list has to be kept around while the network is set up.
+    def __init__(self):
+        self.offsets = array("q", [0])
+        self.neighbors = array("q")
+
+    def add(self, neighbor_ids):
+        self.neighbors.extend(neighbor_ids)
+        self.offsets.append(len(self.neighbors))
+
+    def build(self):
+        offsets = np.array(self.offsets, dtype=np.int64)
+        neighbors = np.array(self.neighbors, dtype=np.int64)
+        node_count = len(offsets) - 1
+        if node_count < 2**31:
+            neighbors = neighbors.astype(np.int32)
+        return Topology(offsets, neighbors)
@@ -0,0 +1,177 @@
+import numpy as np
+
+# Binary event trace of a simulation run. Every packet put in flight (SEND),
+# lost on the way (DROP) or picked up by its destination (DELIVER) is appended
+# to a preallocated structured buffer, which is written out to a flat file in
+# chunks. The file is read back with np.memmap, so traces larger than memory can
+# still be analysed.
+
+SEND, DELIVER, DROP = 0, 1, 2
+
+TRACE_DTYPE = np.dtype([
+    ("tick", "<i4"),   # tick of the send, or the tick the packet was picked up on
+    ("src", "<i4"),
+    ("dst", "<i4"),
+    ("msg", "<i4"),    # index into Network.messages
+    ("kind", "u1"),
+])
+
+
+class TraceRecorder:
+    def __init__(self, path, buffer_size=1 << 16):
+        self.path = path
+        self.file = open(path, "wb")
+        self.buffer = np.empty(buffer_size, dtype=TRACE_DTYPE)
+        self.count = 0
+        self.total = 0
+
+    def record(self, tick, src, dst, msg, kind):
+        self.buffer[self.count] = (tick, src, dst, msg, kind)
+        self.count += 1
+        if self.count == len(self.buffer):
+            self.flush()
+
+    def flush(self):
+        self.file.write(self.buffer[:self.count].tobytes())
+        self.file.flush()
+        self.total += self.count
+        self.count = 0
+
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def load_trace(path):
+    return np.memmap(path, dtype=TRACE_DTYPE, mode="r")
+
+
+def first_arrivals(trace, node_count, msg=0):
+    # Tick each node first had the message, or inf. A relay sends no earlier
+    # than its first delivery, while the origin sends before it receives
+    # anything, so the earliest send or delivery is the arrival in both cases.
+    events = trace[(trace["msg"] == msg) & (trace["kind"] != DELIVER)]
+    arrivals = np.full(node_count, np.inf)
+    np.minimum.at(arrivals, events["src"], events["tick"])
+    deliveries = trace[(trace["msg"] == msg) & (trace["kind"] == DELIVER)]
+    np.minimum.at(arrivals, deliveries["dst"], deliveries["tick"])
+    return arrivals
+
+
+def arrival_cdf(trace, node_count, msg=0):
+    # (ticks, fraction of nodes that had the message by each tick)
+    arrivals = np.sort(first_arrivals(trace, node_count, msg))
+    arrivals = arrivals[np.isfinite(arrivals)]
+    return arrivals, np.arange(1, len(arrivals) + 1) / node_count
+
+
+def duplicate_ratio(trace):
+    # Share of deliveries of a message to a node that already had it
+    deliveries = trace[trace["kind"] == DELIVER]
+    if len(deliveries) == 0:
+        return 0.0
+    firsts = len(np.unique(deliveries[["dst", "msg"]]))
+    return 1 - firsts / len(deliveries)
+
+
+def hop_latencies(trace):
+    # (src, dst, ticks from send to pickup) for every delivered packet. Packets
+    # between the same pair all take the same time, so the k-th send of a
+    # (src, dst, msg) is the k-th delivery of it.
+    def by_key(events):
+        order = np.lexsort((np.arange(len(events)), events["msg"], events["dst"], events["src"]))
+        return events[order]
+
+    sends = by_key(trace[trace["kind"] == SEND])
+    deliveries = by_key(trace[trace["kind"] == DELIVER])
+
+    # Sends still in flight at the end of the trace have no delivery; drop them
+    # by keeping the first as many sends of each key as there are deliveries
+    send_keys = sends[["src", "dst", "msg"]]
+    delivery_keys = deliveries[["src", "dst", "msg"]]
+    keys, send_start = np.unique(send_keys, return_index=True)
+    delivered = np.searchsorted(delivery_keys, keys, side="right") - np.searchsorted(delivery_keys, keys, side="left")
+    rank = np.arange(len(sends)) - np.repeat(send_start, np.diff(np.append(send_start, len(sends))))
+    matched = sends[rank < np.repeat(delivered, np.diff(np.append(send_start, len(sends))))]
+
+    return matched["src"], matched["dst"], deliveries["tick"].astype(np.int64) - matched["tick"]
+
+
+def latency_breakdown(trace, groups, percentiles=(50, 90, 99)):
+    # Per-hop latency percentiles for each (source group, destination group),
+    # e.g. with groups = network.location_ids
+    src, dst, latency = hop_latencies(trace)
+    groups = np.asarray(groups)
+    pairs = np.stack([groups[src], groups[dst]], axis=1)
+    keys, inverse = np.unique(pairs, axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+    breakdown = {}
+    for i, (src_group, dst_group) in enumerate(keys.tolist()):
+        values = latency[inverse == i]
+        breakdown[(src_group, dst_group)] = {
+            "count": len(values),
+            "mean": float(values.mean()),
+            **{f"p{p}": float(np.percentile(values, p)) for p in percentiles},
+        }
+    return breakdown
+
+
+if __name__ == "__main__":
+    import io
+    import os
+    import random
+    import tempfile
+    from contextlib import redirect_stdout
+    from network import Network
+    from latency import LatencyModel
+    from latency_data import latency_data
+    from node import Node
+    from gossip import HalfGreedyGossipStrategy
+    from netsim import run_simulation
+
+    lat = LatencyModel(latency_data, provider_list=["AWS", "Azure", "Google"], max_loss=0.02)
+    node_count = 2000
+    locations = random.choices(lat.locations, k=node_count)
+    path = os.path.join(tempfile.mkdtemp(), "trace.bin")
+
+    # A small buffer so the run goes through several flushes
+    with TraceRecorder(path, buffer_size=4096) as recorder:
+        nodes = [Node(locations[i], i, HalfGreedyGossipStrategy(10)) for i in range(node_count)]
+        network = Network(nodes, lat, trace=recorder)
+        network.initialize()
+        with redirect_stdout(io.StringIO()):
+            run_simulation(network, 0)
+
+    trace = load_trace(path)
+    kinds = np.bincount(trace["kind"], minlength=3)
+    assert kinds[SEND] + kinds[DROP] == network.total_packets
+    assert kinds[DROP] == network.lost_packets
+    assert kinds[DELIVER] == kinds[SEND]
+    assert kinds[DELIVER] == sum(node.received_packet_count for node in nodes)
+
+    expected = [0 if i == 0 else np.inf if node.first_packet_tick is None else node.first_packet_tick
+                for i, node in enumerate(nodes)]
+    assert np.array_equal(first_arrivals(trace, node_count), expected)
+
+    src, dst, latency = hop_latencies(trace)
+    ceil_latency = np.maximum(1, np.ceil(lat.latency_matrix(exact=True)[network.location_ids[src], network.location_ids[dst]]))
+    assert np.array_equal(latency, ceil_latency)
+
+    ticks, fraction = arrival_cdf(trace, node_count)
+    print(f"{len(trace)} events, {os.path.getsize(path) / 2**20:.1f} MiB")
+    for share in [0.5, 0.9, 0.99]:
+        reached = np.searchsorted(fraction, share)
+        if reached < len(ticks):
+            print(f"{share:.0%} of nodes reached by tick {ticks[reached]:.0f}")
+    print(f"Duplicate deliveries: {duplicate_ratio(trace):.3f}")
+
+    breakdown = latency_breakdown(trace, [lat.locations[i].split(" (")[1][:-1] for i in network.location_ids])
+    for (src_provider, dst_provider), stats in sorted(breakdown.items()):
+        print(f"{src_provider} -> {dst_provider}: {stats['count']} hops, mean {stats['mean']:.1f}, p90 {stats['p90']:.0f}")
@@ -0,0 +1,58 @@
+from tracing import SEND, DELIVER, DROP
+
+
+class Transmitter:
+    # The path of a packet from its sender to the in-flight queue and back out:
+    # the sender's egress queue, loss sampling, trace records and link latency.
+    # Network and BroadcastSimulator both send and deliver through one, so they
+    # queue, lose and trace packets the same way. Packets are packed like
+    # packet.encode(), with the message id in place of the message.
+    def __init__(self, latency_model, location_ids, in_flight, loss_sampler, egress=None, trace=None):
+        self.latency_model = latency_model
+        self.location_ids = list(location_ids)
+        self.node_count = len(self.location_ids)
+        self.in_flight = in_flight
+        self.loss_sampler = loss_sampler
+        # Optional capacity.EgressQueues; without one every packet leaves the
+        # moment it is sent
+        self.egress = egress
+        self.trace = trace
+
+    def send(self, tick_count, source_id, destination_id, message_id):
+        # Queue one packet sent at tick_count; returns False if it was lost
+        latency_model = self.latency_model
+        source_location = self.location_ids[source_id]
+        destination_location = self.location_ids[destination_id]
+
+        # The packet holds the sender's uplink even if it is lost on the way
+        departure = tick_count
+        if self.egress is not None:
+            departure = self.egress.departure_time(source_id, departure)
+
+        if latency_model.has_loss:
+            loss_ratio = latency_model.get_loss_ratio_by_id(source_location, destination_location)
+            if self.loss_sampler.is_lost(loss_ratio):
+                if self.trace is not None:
+                    self.trace.record(tick_count, source_id, destination_id, message_id, DROP)
+                return False
+
+        if self.trace is not None:
+            self.trace.record(tick_count, source_id, destination_id, message_id, SEND)
+        arrival_tick = departure + latency_model.get_latency_by_id(source_location, destination_location)
+        node_count = self.node_count
+        self.in_flight.push(arrival_tick, (message_id * node_count + source_id) * node_count + destination_id)
+        return True
+
+    def deliver(self, tick_count):
+        # Yield (message_id * node_count + source_id, destination_id) for every
+        # packet that has landed by tick_count, in arrival order
+        in_flight = self.in_flight
+        node_count = self.node_count
+        trace = self.trace
+        while in_flight and in_flight.next_time() <= tick_count:
+            _, code = in_flight.pop()
+            entry, destination_id = divmod(code, node_count)
+            if trace is not None:
+                message_id, source_id = divmod(entry, node_count)
+                trace.record(tick_count, source_id, destination_id, message_id, DELIVER)
+            yield entry, destination_id